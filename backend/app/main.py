@@ -1,13 +1,86 @@
 from fastapi import FastAPI, UploadFile, File, Form
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from typing import Optional
-import shutil
+import functools
+import asyncio
 import os
 
-from src.recommendation import generate_recommendations_for_user
+from src import config
+from src.cache import get_plan_cache
+from src.inference import MicroBatcher
+from src.ingestion import ingest_upload
+from src.metrics import get_metrics
+from src.plan_store import BufferedPlanWriter, get_plan_store, plan_to_record
+from src.registry import get_registry
+from src.recommendation import (
+    generate_recommendations_cached,
+    lookup_cached_plan,
+    encode_user_row,
+    predict_calories,
+    build_meal_plan_cached,
+)
+
+# Per-stage latency histograms and counters, served at /metrics
+METRICS = get_metrics()
+
+# Load model and foods in the parent (e.g. gunicorn --preload) so forked
+# workers share them copy-on-write instead of each loading their own copy
+if config.PRELOAD_ARTIFACTS:
+    get_registry().preload()
+
+
+async def run_cpu_bound(func, *args):
+    """Run func off the event loop on the app's CPU pool (the loop's default pool outside a lifespan)."""
+    executor = getattr(app.state, "cpu_executor", None)
+    slots = getattr(app.state, "cpu_slots", None)
+    loop = asyncio.get_running_loop()
+    # profiled() is a plain call unless profiling mode is on
+    call = functools.partial(METRICS.profiled, func, *args)
+    if slots is None:
+        return await loop.run_in_executor(executor, call)
+    async with slots:
+        return await loop.run_in_executor(executor, call)
+
+
+async def flush_plans_periodically(plan_writer, executor):
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(config.PLAN_STORE_FLUSH_INTERVAL)
+        try:
+            await loop.run_in_executor(executor, plan_writer.flush)
+        except Exception as e:
+            print("❌ Failed to write plans:", e)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Created per lifespan (not at import) so the app can be started again in
+    # the same process, e.g. by a second TestClient or benchmark run.
+    # Bounded pool for CPU-bound work (pandas / LightGBM release the GIL in
+    # their hot loops), so a slow prediction never runs on the event loop itself
+    executor = ThreadPoolExecutor(max_workers=config.API_CPU_WORKERS, thread_name_prefix="meal-plan")
+    app.state.cpu_executor = executor
+    app.state.cpu_slots = asyncio.Semaphore(config.API_MAX_PENDING)
+    # Opt-in: coalesce concurrent single-row predictions into one model call
+    app.state.batcher = MicroBatcher(predict_calories, executor=executor) if config.MICRO_BATCHING else None
+    # Plans for known users are buffered and written to the plan store in batches
+    app.state.plan_writer = BufferedPlanWriter(get_plan_store())
+    flusher = asyncio.create_task(flush_plans_periodically(app.state.plan_writer, executor))
+    try:
+        yield
+    finally:
+        flusher.cancel()
+        app.state.plan_writer.flush()
+        app.state.cpu_executor = app.state.cpu_slots = app.state.batcher = app.state.plan_writer = None
+        executor.shutdown(wait=False, cancel_futures=True)
 
-app = FastAPI(title="Meal Plan API")
+
+app = FastAPI(title="Meal Plan API", lifespan=lifespan)
 
 # Allow CORS (frontend can access API)
 app.add_middleware(
@@ -18,8 +91,7 @@ app.add_middleware(
 )
 
 # ✅ Force absolute path for upload folder
-PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-UPLOAD_DIR = os.path.join(PROJECT_ROOT, "data", "uploads")
+UPLOAD_DIR = str(config.UPLOAD_DIR)
 
 # Force-create the upload directory
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -35,6 +107,56 @@ def home():
     return {"message": "Meal Plan API is running properly."}
 
 
+@app.get("/inference_stats")
+def inference_stats():
+    batcher = getattr(app.state, "batcher", None)
+    if batcher is None:
+        return {"enabled": False}
+    return batcher.stats()
+
+
+@app.get("/cache_stats")
+def cache_stats():
+    cache = get_plan_cache()
+    if cache is None:
+        return {"enabled": False}
+    return cache.stats()
+
+
+@app.get("/metrics")
+def metrics():
+    gauges = {}
+    batcher = getattr(app.state, "batcher", None)
+    if batcher is not None:
+        gauges["meal_plan_batcher"] = batcher.stats()
+    cache = get_plan_cache()
+    if cache is not None:
+        gauges["meal_plan_cache"] = cache.stats()
+    return PlainTextResponse(METRICS.render(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/profile")
+def profile(top: int = 40):
+    if not METRICS.profiling:
+        return {"enabled": False}
+    return PlainTextResponse(METRICS.profile_report(top))
+
+
+@app.get("/plans/{user_id}/latest")
+async def latest_plan(user_id: int):
+    plan = await run_cpu_bound(get_plan_store().latest_plan, user_id)
+    if plan is None:
+        return {"error": f"No plan found for user {user_id}"}
+    return plan
+
+
+@app.get("/plans")
+async def list_plans(after_id: int = 0, limit: int = 100):
+    limit = max(1, min(limit, 1000))
+    plans, next_after = await run_cpu_bound(get_plan_store().list_plans, after_id, limit)
+    return {"plans": plans, "next_after_id": next_after}
+
+
 @app.post("/generate_meal_plan")
 async def generate_meal_plan(
     age: int = Form(...),
@@ -44,24 +166,33 @@ async def generate_meal_plan(
     gender: str = Form(...),
     goal: str = Form(...),
     diabetes: str = Form(...),
+    user_id: Optional[int] = Form(None),
     report: Optional[UploadFile] = File(None),
 ):
+    with METRICS.timer("meal_plan_request_seconds", endpoint="generate_meal_plan"):
+        plan = await _generate_meal_plan(
+            age, weight_kg, height_cm, activity_level, gender, goal, diabetes, user_id, report
+        )
+        outcome = "error" if "error" in plan else "ok"
+        METRICS.inc("meal_plan_requests_total", endpoint="generate_meal_plan", outcome=outcome)
+        with METRICS.stage("serialization"):
+            return JSONResponse(jsonable_encoder(plan))
+
+
+async def _generate_meal_plan(age, weight_kg, height_cm, activity_level, gender, goal, diabetes, user_id, report):
     try:
         report_path = None
+        report_data = None
+        report_hash = None
 
-        # ✅ Ensure upload folder exists
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-        # ✅ Save uploaded file (if provided)
+        # ✅ Stream uploaded file (if provided) into content-addressed storage
         if report:
-            filename = report.filename or "uploaded_report.txt"
-            report_path = os.path.join(UPLOAD_DIR, filename)
-
-            # Debug print (will show in terminal)
-            print(f"Saving file to: {report_path}")
-
-            with open(report_path, "wb") as buffer:
-                shutil.copyfileobj(report.file, buffer)
+            with METRICS.stage("upload_write"):
+                ingested = await ingest_upload(report, UPLOAD_DIR)
+            METRICS.inc("meal_plan_upload_bytes_total", ingested.size)
+            report_path = ingested.path
+            report_data = ingested.data
+            report_hash = ingested.sha256
 
         # ✅ Prepare data for recommendation
         input_data = {
@@ -73,9 +204,25 @@ async def generate_meal_plan(
             "goal": goal,
             "diabetes": diabetes.lower() == "true",
             "report_file": report_path,
+            "report_data": report_data,
+            "user_id": user_id,
         }
 
-        plan = generate_recommendations_for_user(input_data)
+        batcher = getattr(app.state, "batcher", None)
+        plan_writer = getattr(app.state, "plan_writer", None)
+        if batcher is not None:
+            input_data, cache_key, plan = await run_cpu_bound(lookup_cached_plan, input_data, report_hash)
+            if plan is None:
+                with METRICS.stage("feature_encoding"):
+                    features = encode_user_row(input_data)
+                predicted_calories = await batcher.predict(features)
+                # The cache put can be a SQLite write, so it runs in the pool too
+                plan = await run_cpu_bound(build_meal_plan_cached, input_data, predicted_calories, cache_key)
+        else:
+            plan = await run_cpu_bound(generate_recommendations_cached, input_data, report_hash)
+
+        if user_id is not None and plan_writer is not None:
+            plan_writer.add(plan_to_record(plan, input_data))
         return plan
 
     except Exception as e:
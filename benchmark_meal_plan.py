@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.utils import peak_memory_mb
+
+PROFILE_FIELDS = ["age", "weight_kg", "height_cm", "activity_level", "gender", "goal", "diabetes"]
+# Summary fields compared against a baseline: (name, True if higher is better)
+REGRESSION_CHECKS = [("throughput_rps", True), ("p50_ms", False), ("p99_ms", False)]
+
+
+# ---------- corpus ----------
+
+def load_corpus(path):
+    """
+    One JSON object per line with the /generate_meal_plan form fields
+    (optionally nested under "body", plus an optional user_id). Lines
+    without a complete profile are skipped.
+    """
+    profiles = []
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if isinstance(entry.get("body"), dict):
+                entry = entry["body"]
+            if all(field in entry for field in PROFILE_FIELDS):
+                profiles.append({k: entry[k] for k in PROFILE_FIELDS + ["user_id"] if k in entry})
+    if not profiles:
+        raise ValueError(f"❌ No request profiles found in {path}")
+    return profiles
+
+
+def synthetic_corpus(users_file, n, seed, with_user_ids=False):
+    """Profiles resampled from users.csv with weight/height jitter; the same seed gives the same corpus."""
+    rng = np.random.default_rng(seed)
+    users = pd.read_csv(users_file)
+    sample = users.iloc[rng.integers(0, len(users), size=n)].reset_index(drop=True)
+    sample["weight_kg"] = (sample["weight_kg"] + rng.normal(0, 3, size=n)).round(1)
+    sample["height_cm"] = (sample["height_cm"] + rng.normal(0, 2, size=n)).round(1)
+    sample["diabetes"] = sample["diabetes"].astype(str).str.strip().str.lower().isin(["yes", "true", "1"])
+    columns = PROFILE_FIELDS + (["user_id"] if with_user_ids else [])
+    return sample[columns].to_dict(orient="records")
+
+
+# ---------- replay ----------
+
+async def replay(app, profiles, concurrency, report_bytes=None, warmup=0):
+    """
+    Send every profile to /generate_meal_plan through an in-process ASGI
+    transport (no sockets), `concurrency` requests at a time. Metrics are
+    reset after the warmup so /metrics reflects the measured run only.
+    Returns (latencies_s, errors, elapsed_s, metrics_text).
+    """
+    import httpx
+    from src.metrics import get_metrics
+
+    latencies = np.zeros(len(profiles))
+    errors = 0
+    queue = asyncio.Queue()
+    for i, profile in enumerate(profiles):
+        queue.put_nowait((i, profile))
+
+    async def send(client, profile):
+        data = {k: str(v).lower() if isinstance(v, bool) else str(v) for k, v in profile.items()}
+        files = None
+        if report_bytes is not None and str(profile.get("diabetes")).lower() in ("true", "yes", "1"):
+            files = {"report": ("report.csv", report_bytes, "text/csv")}
+        response = await client.post("/generate_meal_plan", data=data, files=files)
+        return response.status_code == 200 and "error" not in response.json()
+
+    async def worker(client):
+        nonlocal errors
+        while not queue.empty():
+            i, profile = queue.get_nowait()
+            start = time.perf_counter()
+            ok = await send(client, profile)
+            latencies[i] = time.perf_counter() - start
+            errors += not ok
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for profile in profiles[:warmup]:
+                await send(client, profile)
+            get_metrics().reset()
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+            metrics_text = (await client.get("/metrics")).text
+    return latencies, errors, elapsed, metrics_text
+
+
+def summarize(latencies, errors, elapsed, concurrency, memory_before):
+    latencies_ms = 1000.0 * latencies
+    return {
+        "requests": int(len(latencies)),
+        "concurrency": concurrency,
+        "errors": int(errors),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p90_ms": float(np.percentile(latencies_ms, 90)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "max_ms": float(latencies_ms.max()),
+        "rss_before_mb": memory_before,
+        "peak_rss_mb": peak_memory_mb(),
+    }
+
+
+def check_regressions(summary, baseline, tolerance):
+    """Names of summary fields that are worse than the baseline by more than `tolerance`."""
+    regressions = []
+    for name, higher_is_better in REGRESSION_CHECKS:
+        old, new = baseline.get(name), summary.get(name)
+        if not old or new is None:
+            continue
+        change = (old - new) / old if higher_is_better else (new - old) / old
+        if change > tolerance:
+            regressions.append(f"{name}: {old:.2f} -> {new:.2f} ({change:+.0%} worse)")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay meal-plan requests against the API in-process.")
+    parser.add_argument("--corpus", default=None, help="JSONL of request profiles (default: synthetic from --users)")
+    parser.add_argument("--users", default=None, help="users CSV for synthetic profiles (default: config.USERS_FILE)")
+    parser.add_argument("--requests", type=int, default=1000, help="synthetic profiles to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=20, help="requests sent before measuring")
+    parser.add_argument("--report", default=None, help="clinical report CSV uploaded with diabetic requests")
+    parser.add_argument("--user-ids", action="store_true",
+                        help="send user_id (exercises the report store and writes to the plan store)")
+    parser.add_argument("--no-cache", action="store_true", help="disable the plan cache")
+    parser.add_argument("--micro-batching", action="store_true", help="enable micro-batching of predictions")
+    parser.add_argument("--profile", action="store_true", help="enable profiling mode and print the profile")
+    parser.add_argument("--output", default=None, help="write the summary as JSON")
+    parser.add_argument("--baseline", default=None, help="summary JSON from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="allowed relative slowdown vs --baseline before exiting with status 1")
+    args = parser.parse_args()
+
+    # Feature flags are read from the environment when the app is imported
+    if args.no_cache:
+        os.environ["MEAL_PLAN_CACHE"] = "0"
+    if args.micro_batching:
+        os.environ["MEAL_PLAN_MICRO_BATCHING"] = "1"
+    if args.profile:
+        os.environ["MEAL_PLAN_PROFILE"] = "1"
+
+    from src import config
+    from src.metrics import get_metrics
+    from backend.app.main import app
+
+    if args.corpus:
+        profiles = load_corpus(args.corpus)
+    else:
+        profiles = synthetic_corpus(args.users or config.USERS_FILE, args.requests, args.seed, args.user_ids)
+    report_bytes = None
+    if args.report:
+        with open(args.report, "rb") as f:
+            report_bytes = f.read()
+
+    memory_before = peak_memory_mb()
+    latencies, errors, elapsed, metrics_text = asyncio.run(
+        replay(app, profiles, args.concurrency, report_bytes, args.warmup)
+    )
+    summary = summarize(latencies, errors, elapsed, args.concurrency, memory_before)
+    summary["stages"] = get_metrics().stage_summary()
+
+    print(
+        f"✅ {summary['requests']} requests at concurrency {args.concurrency} in {elapsed:.2f}s: "
+        f"{summary['throughput_rps']:.1f} req/s, p50 {summary['p50_ms']:.2f} ms, "
+        f"p99 {summary['p99_ms']:.2f} ms, max {summary['max_ms']:.2f} ms, {summary['errors']} errors"
+    )
+    print(f"   Peak memory: {summary['peak_rss_mb']:.0f} MB (before replay {memory_before:.0f} MB)")
+    for stage, s in summary["stages"].items():
+        print(f"   {stage:<18} n={s['count']:<6} mean {s['mean_ms']:.3f} ms  p99 <= {s['p99_ms']:.2f} ms")
+    if args.profile:
+        print(get_metrics().profile_report())
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = check_regressions(summary, json.load(f), args.max_regression)
+        if regressions:
+            print("❌ Regressions against baseline:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(f"✅ Within {args.max_regression:.0%} of baseline {args.baseline}")
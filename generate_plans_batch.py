@@ -0,0 +1,113 @@
+import argparse
+import importlib.util
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.plan_store import PlanStore
+from src.registry import get_registry
+from src.report_store import ClinicalReportStore
+from src.recommendation import generate_recommendations_batch
+
+
+def _run_chunk(args):
+    users_chunk, reports_df, seed = args
+    return generate_recommendations_batch(users_chunk, reports_df, random_state=seed)
+
+
+def generate_all_plans(users_file, reports_file=None, workers=1, seed=None):
+    users_df = pd.read_csv(users_file)
+    reports_df = None
+    if reports_file:
+        # Only the latest reading per user is needed for the join
+        store = ClinicalReportStore(reports_file)
+        store.refresh()
+        reports_df = store.latest_many(users_df["user_id"])
+
+    if workers <= 1 or len(users_df) < workers:
+        return generate_recommendations_batch(users_df, reports_df, random_state=seed)
+
+    # Split very large user files across processes (each loads the model once)
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    chunks = [
+        (users_df.iloc[rows], reports_df, seeds[i])
+        for i, rows in enumerate(np.array_split(np.arange(len(users_df)), workers))
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_run_chunk, chunks))
+    return pd.concat(results, ignore_index=True)
+
+
+def parquet_engine_available():
+    """pandas needs pyarrow or fastparquet to write .parquet files."""
+    return any(importlib.util.find_spec(engine) is not None for engine in ("pyarrow", "fastparquet"))
+
+
+def write_plans(plans_df, output_path):
+    output_path = str(output_path)
+    if output_path.endswith(".parquet"):
+        plans_df.to_parquet(output_path, index=False)
+    else:
+        plans_df.to_csv(output_path, index=False)
+
+
+def store_plans(plans_df, store_path):
+    """Append the batch to the plan store with one meal row per item column."""
+    item_columns = [c for c in plans_df.columns if c.rsplit("_", 1)[-1].isdigit() and c.split("_")[0] in
+                    {slot["meal"].lower() for slot in config.MEAL_SLOTS}]
+    plan_fields = [c for c in ["user_id", "name", "age", "gender", "goal", "calories", "protein_g",
+                               "carbs_g", "fat_g", "predicted_calories", "risk", "notes"] if c in plans_df.columns]
+    # Nutrients per food name, so meal rows are stored fully structured
+    cols = config.FOOD_COLUMNS
+    foods = get_registry().get_foods().drop_duplicates(cols["name"]).set_index(cols["name"])
+    nutrients = {
+        name: {key: values.get(cols[key]) for key in ["calories", "protein", "carbs", "fat"]}
+        for name, values in foods.to_dict(orient="index").items()
+    }
+
+    records = []
+    for row in plans_df[plan_fields + item_columns].itertuples(index=False):
+        row = row._asdict()
+        record = {field: row[field] for field in plan_fields}
+        record = {k: (v.item() if hasattr(v, "item") else v) for k, v in record.items()}
+        record["predicted_value"] = record.pop("predicted_calories", None)
+        record["risk"] = record.get("risk") or None
+        record["source"] = "batch"
+        record["meals"] = [
+            {"meal": column.rsplit("_", 1)[0].capitalize(), "item": row[column], **nutrients.get(row[column], {})}
+            for column in item_columns
+        ]
+        records.append(record)
+    return len(PlanStore(store_path).append_plans(records))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate meal plans for all users in one batch.")
+    parser.add_argument("--users", default=str(config.USERS_FILE), help="Users CSV file")
+    parser.add_argument("--reports", default=str(config.REPORTS_FILE), help="Clinical reports CSV ('' to skip)")
+    parser.add_argument("--output", default=str(config.BATCH_PLANS_FILE), help="Output file: .csv, or .parquet (needs pyarrow or fastparquet)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for meal selection")
+    parser.add_argument("--store", nargs="?", const=str(config.PLAN_STORE_PATH), default=None,
+                        help="Also append the plans to the plan store (default path from config)")
+    args = parser.parse_args()
+    # Check before generating anything, not after all the work is done
+    if args.output.endswith(".parquet") and not parquet_engine_available():
+        parser.error("writing .parquet needs pyarrow or fastparquet; install one or use a .csv output")
+
+    start = time.perf_counter()
+    plans_df = generate_all_plans(args.users, args.reports or None, args.workers, args.seed)
+    write_plans(plans_df, args.output)
+    if args.store:
+        stored = store_plans(plans_df, args.store)
+        print(f"✅ Appended {stored} plans to {args.store}")
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ Generated {len(plans_df)} plans in {elapsed:.2f}s, saved at {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src import config
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def normalize_user_input(user_input):
+    """
+    Round the profile to the cache's resolution so near-identical users share
+    an entry. The normalized input is also what gets predicted on, so a cached
+    plan is exactly the plan the key describes.
+    """
+    normalized = dict(user_input)
+    normalized["age"] = int(user_input["age"])
+    normalized["weight_kg"] = round(float(user_input["weight_kg"]) / config.CACHE_WEIGHT_STEP) * config.CACHE_WEIGHT_STEP
+    normalized["height_cm"] = round(float(user_input["height_cm"]) / config.CACHE_HEIGHT_STEP) * config.CACHE_HEIGHT_STEP
+    normalized["activity_level"] = str(user_input["activity_level"]).strip().lower()
+    normalized["gender"] = str(user_input["gender"]).strip().upper()
+    normalized["goal"] = str(user_input.get("goal", "")).strip().lower()
+    normalized["diabetes"] = bool(user_input.get("diabetes"))
+    return normalized
+
+
+def make_plan_key(normalized_input, model_version, foods_version, report_fingerprint=None):
+    """Cache key: normalized features + goal/diabetes + artifact versions + report fingerprint."""
+    parts = [
+        normalized_input["age"],
+        normalized_input["weight_kg"],
+        normalized_input["height_cm"],
+        normalized_input["activity_level"],
+        normalized_input["gender"],
+        normalized_input["goal"],
+        normalized_input["diabetes"],
+        model_version,
+        foods_version,
+        report_fingerprint if normalized_input["diabetes"] else None,
+    ]
+    return hashlib.sha1(json.dumps(parts, default=_json_default).encode("utf-8")).hexdigest()
+
+
+class SqliteCacheBackend:
+    """
+    Shared second-level cache in a local SQLite file (WAL mode), so several
+    uvicorn workers on one host can reuse each other's entries.
+    """
+
+    def __init__(self, path, max_entries):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS plan_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, generation TEXT, expires_at REAL, stored_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS plan_cache_stored ON plan_cache(stored_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, now):
+        row = self._connect().execute(
+            "SELECT value, generation, expires_at FROM plan_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[2] < now:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def put(self, key, value, generation, expires_at, now):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO plan_cache (key, value, generation, expires_at, stored_at) VALUES (?, ?, ?, ?, ?)",
+            (key, json.dumps(value, default=_json_default), generation, expires_at, now),
+        )
+        self._writes += 1
+        # Trim occasionally rather than on every write
+        if self._writes % 256 == 0:
+            self.trim(now)
+
+    def trim(self, now):
+        conn = self._connect()
+        conn.execute("DELETE FROM plan_cache WHERE expires_at < ?", (now,))
+        conn.execute(
+            "DELETE FROM plan_cache WHERE key IN ("
+            "SELECT key FROM plan_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def invalidate(self, generation):
+        self._connect().execute("DELETE FROM plan_cache WHERE generation IS NOT ?", (generation,))
+
+
+class PlanCache:
+    """
+    Bounded in-process LRU cache with TTL expiry and hit/miss/eviction counters.
+
+    Entries are tagged with a generation (model + foods version); when the
+    generation changes every older entry is dropped, so a hot-reloaded model
+    or foods table never serves stale plans. Cached values are shared, treat
+    them as read-only.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, shared_path=None):
+        self.max_entries = max_entries or config.CACHE_MAX_ENTRIES
+        self.ttl = config.CACHE_TTL_SECONDS if ttl is None else ttl
+        self._entries = OrderedDict()   # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._generation = None
+        self.shared = SqliteCacheBackend(shared_path, self.max_entries * 10) if shared_path else None
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def set_generation(self, generation):
+        """Drop everything cached under an older model/foods version."""
+        if generation == self._generation:
+            return
+        with self._lock:
+            if generation == self._generation:
+                return
+            if self._generation is not None:
+                self.invalidations += 1
+                self._entries.clear()
+                if self.shared is not None:
+                    self.shared.invalidate(generation)
+            self._generation = generation
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] >= now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+                self.expirations += 1
+
+        if self.shared is not None:
+            found = self.shared.get(key, now)
+            if found is not None and found[1] == self._generation:
+                value, _, expires_at = found
+                self._store(key, value, expires_at)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        expires_at = time.time() + self.ttl
+        self._store(key, value, expires_at)
+        if self.shared is not None:
+            self.shared.put(key, value, self._generation, expires_at, time.time())
+
+    def _store(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "enabled": True,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "shared_backend": self.shared.path if self.shared is not None else None,
+        }
+
+
+_plan_cache = None
+
+
+def get_plan_cache():
+    """Process-wide plan cache, or None when caching is disabled in config."""
+    global _plan_cache
+    if _plan_cache is None and config.CACHE_ENABLED:
+        shared_path = config.CACHE_SHARED_PATH
+        if shared_path:
+            os.makedirs(os.path.dirname(os.path.abspath(shared_path)), exist_ok=True)
+        _plan_cache = PlanCache(shared_path=shared_path)
+    return _plan_cache
@@ -1,39 +1,45 @@
 import pandas as pd
 
-def analyze_report(report_path):
+from src.metrics import get_metrics
+from src.report_store import get_store
+from src.risk_engine import get_engine
+
+
+def analyze_report(report_path=None, user_id=None):
     """
-    Analyze a diabetes clinical report CSV for a single user.
+    Analyze a diabetes clinical report CSV (path or file-like object) for a single user.
     Assumes columns: fasting_blood_sugar, postprandial_sugar, hba1c
+    If user_id is given, the user's latest reading is read from the
+    indexed clinical report store instead of parsing a file.
     Returns a dict with risk and notes.
     """
-    try:
-        df = pd.read_csv(report_path)
-    except Exception as e:
-        return {"error": f"Failed to read report: {e}"}
-
-    # Simple diabetes risk check
-    risk = "Low"
-    notes = []
-
-    if "fasting_blood_sugar" in df.columns:
-        fbs = df["fasting_blood_sugar"].iloc[0]
-        if fbs > 126:
-            risk = "High"
-            notes.append(f"High fasting blood sugar: {fbs}")
-
-    if "postprandial_sugar" in df.columns:
-        pps = df["postprandial_sugar"].iloc[0]
-        if pps > 200:
-            risk = "High"
-            notes.append(f"High postprandial sugar: {pps}")
-
-    if "hba1c" in df.columns:
-        hba1c = df["hba1c"].iloc[0]
-        if hba1c > 6.5:
-            risk = "High"
-            notes.append(f"High HbA1c: {hba1c}")
+    metrics = get_metrics()
+    if user_id is not None:
+        try:
+            with metrics.stage("report_lookup"):
+                reading = get_store().latest(user_id)
+        except Exception as e:
+            return {"error": f"Failed to read report store: {e}"}
+        if reading is None:
+            return {"error": f"No clinical report found for user {user_id}"}
+        df = pd.DataFrame([reading])
+    else:
+        try:
+            # Only the first reading is used, so don't parse the rest of the file
+            with metrics.stage("report_parse"):
+                df = pd.read_csv(report_path, nrows=1)
+        except Exception as e:
+            metrics.inc("meal_plan_report_errors_total")
+            return {"error": f"Failed to read report: {e}"}
+        if df.empty:
+            metrics.inc("meal_plan_report_errors_total")
+            return {"error": "Report has no readings"}
 
-    if not notes:
-        notes.append("All readings normal")
+    # Diabetes risk check (rules come from config.RISK_RULES)
+    with metrics.stage("risk_evaluation"):
+        engine = get_engine()
+        levels, fired = engine.evaluate(df)
+        risk = engine.level_names(levels)[0]
+        notes = engine.notes(df, fired)[0].split("; ")
 
     return {"risk": risk, "notes": notes}
@@ -1,12 +1,109 @@
 # src/config.py
+import os
 from pathlib import Path
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = ROOT_DIR / "data"
 MODEL_DIR = ROOT_DIR / "models"
 
-USERS_FILE = DATA_DIR / "users_sample.csv"
-REPORTS_FILE = DATA_DIR / "clinical_reports_sample.csv"
+USERS_FILE = DATA_DIR / "users.csv"
+REPORTS_FILE = DATA_DIR / "clinical_reports.csv"
+REPORT_STORE_DIR = DATA_DIR / "report_store"
 FOODS_FILE = DATA_DIR / "foods.csv"
 RECOMMENDATIONS_FILE = DATA_DIR / "plans/recommendations.json"
 ML_MODEL_PATH = MODEL_DIR / "calorie_macro_predictor_lgbm.pkl"
+ML_TREES_DIR = MODEL_DIR / "calorie_macro_predictor_trees"   # NumPy export (python -m src.registry)
+
+# Training pipeline (src/training.py, train_model_lgbm.py)
+TRAIN_CHUNK_SIZE = 100_000          # rows read from users.csv at a time
+TRAIN_VALIDATION_FRACTION = 0.2     # held out for early stopping
+TRAIN_MAX_ESTIMATORS = 1000
+TRAIN_EARLY_STOPPING_ROUNDS = 50
+TRAIN_REFIT_ROUNDS = 100            # boosting rounds added by an incremental refit
+TRAIN_PARAM_GRID = {
+    "num_leaves": [15, 31, 63],
+    "learning_rate": [0.05, 0.1],
+    "min_child_samples": [10, 20],
+}
+
+# Model/data registry (src/registry.py)
+USE_NUMPY_TREES = os.getenv("MEAL_PLAN_NUMPY_TREES", "0") == "1"
+ARTIFACT_RELOAD_INTERVAL = 2.0   # seconds between artifact change checks
+PRELOAD_ARTIFACTS = os.getenv("MEAL_PLAN_PRELOAD", "0") == "1"   # load before workers fork
+
+PLANS_DIR = ROOT_DIR / "plans"
+BATCH_PLANS_FILE = PLANS_DIR / "all_plans.csv"
+PLAN_STORE_PATH = DATA_DIR / "plans.sqlite"    # indexed plan store (src/plan_store.py)
+PLAN_STORE_BATCH_SIZE = 500
+PLAN_STORE_FLUSH_INTERVAL = 1.0                # seconds between API write batches
+
+# Diabetes risk rules, evaluated column-wise by src/risk_engine.py.
+# Levels are ordered from lowest to highest; within one column only the
+# highest triggered rule contributes a note.
+RISK_LEVELS = ["Low", "High"]
+RISK_RULES = [
+    {"column": "fasting_blood_sugar", "op": ">", "threshold": 126, "level": "High", "note": "High fasting blood sugar"},
+    {"column": "postprandial_sugar", "op": ">", "threshold": 200, "level": "High", "note": "High postprandial sugar"},
+    {"column": "hba1c", "op": ">", "threshold": 6.5, "level": "High", "note": "High HbA1c"},
+]
+# Trend across a user's readings: change in this column beyond the tolerance
+RISK_TREND_COLUMN = "hba1c"
+RISK_TREND_TOLERANCE = 0.2
+
+# Upload ingestion and API worker pool
+UPLOAD_DIR = DATA_DIR / "uploads"
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_MEMORY_LIMIT = 4 * 1024 * 1024   # larger uploads are spooled to disk
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+API_CPU_WORKERS = 4                     # threads for pandas / LightGBM work
+API_MAX_PENDING = 64                    # requests allowed to wait for a worker
+
+# Opt-in micro-batching of concurrent predictions (src/inference.py)
+MICRO_BATCHING = os.getenv("MEAL_PLAN_MICRO_BATCHING", "0") == "1"
+MICRO_BATCH_WINDOW_MS = float(os.getenv("MEAL_PLAN_MICRO_BATCH_WINDOW_MS", "5"))
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MEAL_PLAN_MICRO_BATCH_MAX_SIZE", "64"))
+
+# Foods table layout (logical name -> column in foods.csv). foods.csv is not
+# shipped; see README.md. Nutrients are per serving (kcal, grams).
+FOOD_COLUMNS = {
+    "name": "food_name",
+    "category": "category",               # matched against MEAL_SLOTS categories
+    "calories": "calories",
+    "protein": "protein",
+    "carbs": "carbs",
+    "fat": "fat",
+    "suitable_for": "suitable_for",       # optional; "diabetic" marks low-glycemic foods
+    "glycemic_index": "glycemic_index",   # optional; preferred over suitable_for when present
+}
+REQUIRED_FOOD_COLUMNS = ["name", "category", "calories", "protein", "carbs", "fat"]
+
+# Meal planner (src/meal_planner.py)
+MEAL_SLOTS = [
+    {"meal": "Breakfast", "categories": ["breakfast"], "share": 0.25, "items": 2},
+    {"meal": "Lunch", "categories": ["lunch"], "share": 0.40, "items": 2},
+    {"meal": "Dinner", "categories": ["dinner"], "share": 0.35, "items": 2},
+]
+GOAL_MACRO_SPLIT = {   # share of calories from protein / carbs / fat
+    "weight_loss": {"protein": 0.35, "carbs": 0.40, "fat": 0.25},
+    "maintain": {"protein": 0.30, "carbs": 0.50, "fat": 0.20},
+    "muscle_gain": {"protein": 0.35, "carbs": 0.45, "fat": 0.20},
+}
+DIABETIC_CARB_SHARE = 0.40    # max share of calories from carbs for diabetic users
+HIGH_GLYCEMIC_INDEX = 55      # foods above this are avoided for diabetic users
+PLANNER_MIN_CALORIES = 1200   # floor for the planning target
+PLANNER_CANDIDATES = 256      # random item combinations scored per meal
+PLANNER_TOLERANCE = 0.10      # relative calorie error still considered on target
+
+# Prediction / plan cache (src/cache.py)
+CACHE_ENABLED = os.getenv("MEAL_PLAN_CACHE", "1") == "1"
+CACHE_MAX_ENTRIES = 10_000
+CACHE_TTL_SECONDS = 3600
+CACHE_WEIGHT_STEP = 1.0    # kg; profiles are rounded to this before keying
+CACHE_HEIGHT_STEP = 1.0    # cm
+CACHE_SHARED_PATH = os.getenv("MEAL_PLAN_CACHE_SHARED", "")   # e.g. data/cache/plans.sqlite
+
+# Hot-path metrics and profiling (src/metrics.py, GET /metrics and /profile)
+METRICS_ENABLED = os.getenv("MEAL_PLAN_METRICS", "1") == "1"
+METRICS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PROFILING = os.getenv("MEAL_PLAN_PROFILE", "0") == "1"   # cProfile CPU-bound request work
+PROFILE_TOP_N = 40
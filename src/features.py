@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Bump when the encoding changes in a way that needs a retrained model
+ENCODER_VERSION = 1
+
+FEATURE_NAMES = ["age", "weight_kg", "height_cm", "activity_level", "gender"]
+ACTIVITY_LEVELS = {
+    "sedentary": 0,
+    "low": 1,
+    "light": 1,
+    "moderate": 2,
+    "active": 3,
+    "high": 3,
+    "very_active": 4,
+}
+GENDERS = {"m": 1, "male": 1, "f": 0, "female": 0}
+GOALS = {"weight_loss": 0, "maintain": 1, "muscle_gain": 2}
+
+
+class FeatureEncoder:
+    """
+    Turns user profiles into the model's feature matrix, the same way for
+    training and serving. Categories are matched case-insensitively; unknown
+    values become NaN so LightGBM treats them as missing rather than as a
+    real category. The encoder is saved inside the model artifact, so a
+    model is always served with the encoding it was trained on.
+    """
+
+    def __init__(self, activity_levels=None, genders=None, goals=None, feature_names=None, version=ENCODER_VERSION):
+        self.activity_levels = dict(activity_levels or ACTIVITY_LEVELS)
+        self.genders = dict(genders or GENDERS)
+        self.goals = dict(goals or GOALS)
+        self.feature_names = list(feature_names or FEATURE_NAMES)
+        self.version = version
+
+    @staticmethod
+    def _lookup(values, mapping):
+        return values.astype(str).str.strip().str.lower().map(mapping).astype(np.float64)
+
+    def encode(self, df, dtype=np.float64):
+        """Vectorized encoding of a users DataFrame (one row or millions)."""
+        features = pd.DataFrame(index=df.index)
+        for name in self.feature_names:
+            if name == "activity_level":
+                features[name] = self._lookup(df[name], self.activity_levels)
+            elif name == "gender":
+                features[name] = self._lookup(df[name], self.genders)
+            else:
+                features[name] = pd.to_numeric(df[name], errors="coerce")
+        return features.astype(dtype)
+
+    def encode_row(self, user):
+        """Same encoding as encode() for one dict, without building a DataFrame."""
+        row = []
+        for name in self.feature_names:
+            value = user.get(name)
+            if name == "activity_level":
+                value = self.activity_levels.get(str(value).strip().lower(), np.nan)
+            elif name == "gender":
+                value = self.genders.get(str(value).strip().lower(), np.nan)
+            try:
+                row.append(float(value))
+            except (TypeError, ValueError):
+                row.append(np.nan)
+        return np.array(row, dtype=np.float64)
+
+    def encode_target(self, goals):
+        """Goal codes for training; unknown goals are NaN and should be dropped."""
+        return self._lookup(pd.Series(goals), self.goals).to_numpy()
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "feature_names": self.feature_names,
+            "activity_levels": self.activity_levels,
+            "genders": self.genders,
+            "goals": self.goals,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            activity_levels=data["activity_levels"],
+            genders=data["genders"],
+            goals=data["goals"],
+            feature_names=data["feature_names"],
+            version=data["version"],
+        )
+
+
+DEFAULT_ENCODER = FeatureEncoder()
+
+
+def get_encoder(model=None):
+    """The encoder bundled with a loaded model, or the default for legacy pickles."""
+    return getattr(model, "feature_encoder", None) or DEFAULT_ENCODER
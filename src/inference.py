@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import numpy as np
+
+from src import config
+
+
+class MicroBatcher:
+    """
+    Collects single-row predictions from concurrent requests and runs them
+    as one vectorized model call.
+
+    A batch is flushed when it reaches max_batch_size or when window_ms has
+    passed since its first row arrived, so no request waits longer than the
+    window for its batch to start.
+    """
+
+    def __init__(self, predict_fn, window_ms=None, max_batch_size=None, executor=None):
+        self.predict_fn = predict_fn
+        self.window = (config.MICRO_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+        self.max_batch_size = max_batch_size or config.MICRO_BATCH_MAX_SIZE
+        self.executor = executor
+
+        self._pending = []
+        self._flush_handle = None
+        self._tasks = set()
+
+        # Statistics
+        self.requests = 0
+        self.batches = 0
+        self.batched_rows = 0
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.last_batch_size = 0
+        self.max_batch_seen = 0
+        self.total_wait_s = 0.0
+        self.batch_size_buckets = {}
+
+    async def predict(self, feature_row):
+        """Queue one encoded feature row and wait for its prediction."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((np.asarray(feature_row, dtype=np.float64), future, time.perf_counter()))
+        self.requests += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        now = time.perf_counter()
+        size = len(batch)
+        self.batches += 1
+        self.batched_rows += size
+        self.last_batch_size = size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        self.total_wait_s += sum(now - queued_at for _, _, queued_at in batch)
+        bucket = 1 << (size - 1).bit_length()  # 1, 2, 4, 8, ...
+        self.batch_size_buckets[bucket] = self.batch_size_buckets.get(bucket, 0) + 1
+
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        rows = np.vstack([row for row, _, _ in batch])
+        self.in_flight += len(batch)
+        try:
+            loop = asyncio.get_running_loop()
+            predictions = await loop.run_in_executor(self.executor, self.predict_fn, rows)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future, _), value in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(value)
+        finally:
+            self.in_flight -= len(batch)
+
+    def stats(self):
+        return {
+            "enabled": True,
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "requests": self.requests,
+            "batches": self.batches,
+            "queue_depth": len(self._pending),
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": self.in_flight,
+            "avg_batch_size": self.batched_rows / self.batches if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size_seen": self.max_batch_seen,
+            "avg_queue_wait_ms": 1000.0 * self.total_wait_s / self.batched_rows if self.batched_rows else 0.0,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self.batch_size_buckets.items())},
+        }
@@ -0,0 +1,102 @@
+import asyncio
+import functools
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+from src import config
+
+
+@dataclass
+class IngestedReport:
+    path: str                 # content-addressed file under UPLOAD_DIR
+    sha256: str
+    size: int
+    data: Optional[bytes]     # in-memory copy for small reports (None if spooled)
+    deduplicated: bool        # True if an identical upload was already stored
+
+
+def _write_bytes(path, data):
+    """Store data at path unless it is already there; returns True if it was (a deduplicated upload)."""
+    if os.path.exists(path):
+        return True
+    # Write to a temp file first so readers never see a half-written report
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return False
+
+
+def _publish_spool(spool, path):
+    """Move a finished spool file to path, or drop it if path already exists; returns True if it did."""
+    spool.close()
+    if os.path.exists(path):
+        os.remove(spool.name)
+        return True
+    os.replace(spool.name, path)
+    return False
+
+
+def _discard_spool(spool):
+    spool.close()
+    if os.path.exists(spool.name):
+        os.remove(spool.name)
+
+
+async def ingest_upload(upload, upload_dir=config.UPLOAD_DIR):
+    """
+    Stream an UploadFile in chunks, hashing as it goes, and store it
+    content-addressed as <upload_dir>/<sha256>, so repeat uploads of the same
+    bytes are stored once whatever their filename. Small reports are also
+    kept in memory so they can be parsed without reading them back from
+    disk. All file I/O runs off the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    upload_dir = str(upload_dir)
+    await loop.run_in_executor(None, functools.partial(os.makedirs, upload_dir, exist_ok=True))
+
+    hasher = hashlib.sha256()
+    chunks = []
+    size = 0
+    spool = None
+
+    try:
+        while True:
+            chunk = await upload.read(config.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > config.MAX_UPLOAD_BYTES:
+                raise ValueError(f"Report is larger than {config.MAX_UPLOAD_BYTES} bytes")
+            hasher.update(chunk)
+
+            if spool is None and size > config.UPLOAD_MEMORY_LIMIT:
+                # Too big to keep in memory: move what we have to a temp file
+                spool = await loop.run_in_executor(
+                    None, lambda: tempfile.NamedTemporaryFile(dir=upload_dir, suffix=".part", delete=False)
+                )
+                await loop.run_in_executor(None, spool.write, b"".join(chunks))
+                chunks = []
+            if spool is not None:
+                await loop.run_in_executor(None, spool.write, chunk)
+            else:
+                chunks.append(chunk)
+
+        digest = hasher.hexdigest()
+        path = os.path.join(upload_dir, digest)
+
+        if spool is not None:
+            deduplicated = await loop.run_in_executor(None, _publish_spool, spool, path)
+            spool = None
+            return IngestedReport(path, digest, size, None, deduplicated)
+
+        data = b"".join(chunks)
+        deduplicated = await loop.run_in_executor(None, _write_bytes, path, data)
+        return IngestedReport(path, digest, size, data, deduplicated)
+
+    finally:
+        if spool is not None:
+            await loop.run_in_executor(None, _discard_spool, spool)
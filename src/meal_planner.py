@@ -0,0 +1,188 @@
+import itertools
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from src import config
+
+NUTRIENTS = ["calories", "protein", "carbs", "fat"]
+CALORIES, PROTEIN, CARBS, FAT = range(4)
+# Relative importance of each nutrient when scoring a combination
+NUTRIENT_WEIGHTS = np.array([2.0, 1.0, 1.0, 1.0])
+CARB_LIMIT_PENALTY = 10.0
+UNSUITABLE_PENALTY = 100.0
+BATCH_CHUNK = 1024
+
+
+class MealPlanner:
+    """
+    Picks breakfast/lunch/dinner items that hit calorie and macro targets.
+
+    The foods table is precomputed once into a (foods x nutrients) matrix,
+    per-slot category indexes and a "not suitable for diabetics" mask. For
+    each meal a set of item combinations is drawn from the slot's index
+    (every combination when the pool is small) and scored against each
+    user's targets in one NumPy expression; the best one wins. The same
+    code path plans one user or many (rows are just a batch axis).
+    """
+
+    def __init__(self, foods_df, slots=None, candidates=None):
+        self.foods_df = foods_df
+        self.slots = slots or config.MEAL_SLOTS
+        self.candidates = candidates or config.PLANNER_CANDIDATES
+        self.records = foods_df.to_dict(orient="records")
+        cols = config.FOOD_COLUMNS
+
+        check_food_columns(foods_df)
+
+        self.nutrients = np.column_stack([
+            pd.to_numeric(foods_df[cols[n]], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+            for n in NUTRIENTS
+        ])
+
+        # Foods diabetic users should avoid (high glycemic index or not marked suitable)
+        unsuitable = np.zeros(len(foods_df), dtype=bool)
+        if cols["glycemic_index"] in foods_df.columns:
+            gi = pd.to_numeric(foods_df[cols["glycemic_index"]], errors="coerce").to_numpy()
+            unsuitable |= gi > config.HIGH_GLYCEMIC_INDEX
+        elif cols["suitable_for"] in foods_df.columns:
+            unsuitable |= foods_df[cols["suitable_for"]].astype(str).str.lower().to_numpy() != "diabetic"
+        self.unsuitable = unsuitable
+
+        # Candidate index per slot; a slot with no matching category uses every food
+        category = foods_df[cols["category"]].astype(str).str.lower()
+        self.slot_pools = []
+        for slot in self.slots:
+            pool = np.arange(len(foods_df))
+            matches = np.flatnonzero(category.isin([c.lower() for c in slot["categories"]]).to_numpy())
+            if len(matches):
+                pool = matches
+            self.slot_pools.append(pool)
+
+    def _candidates(self, pool, items, rng):
+        """Item combinations to score for one slot, shared by every user in the batch."""
+        if len(pool) < items:
+            combos = np.array(list(itertools.product(range(len(pool)), repeat=items)))
+        elif math.comb(len(pool), items) <= self.candidates:
+            # Small pool: score every combination exactly
+            combos = np.array(list(itertools.combinations(range(len(pool)), items)))
+        else:
+            combos = np.sort(rng.integers(0, len(pool), size=(self.candidates, items)), axis=1)
+            combos = np.unique(combos[(np.diff(combos, axis=1) != 0).all(axis=1)], axis=0)
+        return pool[combos.reshape(-1, items)]
+
+    def _select(self, targets, carb_limits, diabetic, combos):
+        """Index (into combos) of the best combination for each row of targets."""
+        totals = self.nutrients[combos].sum(axis=1)                      # (candidates, nutrients)
+        unsuitable = self.unsuitable[combos].sum(axis=1)                 # (candidates,)
+
+        scale = np.maximum(targets, 1.0)[:, None, :]
+        error = np.abs(totals[None, :, :] - targets[:, None, :]) / scale
+        score = (error * NUTRIENT_WEIGHTS).sum(axis=2)                   # (rows, candidates)
+
+        over_carbs = np.maximum(totals[None, :, CARBS] - carb_limits[:, None], 0.0) / np.maximum(carb_limits, 1.0)[:, None]
+        score += (CARB_LIMIT_PENALTY * over_carbs + UNSUITABLE_PENALTY * unsuitable[None, :]) * diabetic[:, None]
+        return np.argmin(score, axis=1)
+
+    def targets(self, calories, macros, diabetic):
+        """
+        Daily targets actually planned for: calories floored at
+        PLANNER_MIN_CALORIES, the macro split rescaled to those calories (rows
+        without a usable split use the maintain split) and carbs capped for
+        diabetic users. Returns (daily (n, 4) in NUTRIENTS order, floored (n,) bool).
+        """
+        requested = np.asarray(calories, dtype=np.float64)
+        calories = np.maximum(requested, config.PLANNER_MIN_CALORIES)
+
+        grams = np.column_stack([np.asarray(macros[k], dtype=np.float64) for k in ["protein_g", "carbs_g", "fat_g"]])
+        kcal = grams * np.array([4.0, 4.0, 9.0])
+        total_kcal = kcal.sum(axis=1, keepdims=True)
+        default = config.GOAL_MACRO_SPLIT["maintain"]
+        default_shares = np.array([default["protein"], default["carbs"], default["fat"]])
+        shares = np.where(total_kcal > 0, kcal / np.maximum(total_kcal, 1e-9), default_shares)
+        daily = np.column_stack([calories, shares * calories[:, None] / np.array([4.0, 4.0, 9.0])])
+
+        diabetic = np.asarray(diabetic, dtype=bool)
+        carb_cap = config.DIABETIC_CARB_SHARE * calories / 4
+        daily[:, CARBS] = np.where(diabetic, np.minimum(daily[:, CARBS], carb_cap), daily[:, CARBS])
+        return daily, ~(requested >= config.PLANNER_MIN_CALORIES)
+
+    def plan_batch(self, calories, macros, diabetic, random_state=None):
+        """
+        calories: (n,) daily calorie targets; macros: dict of (n,) gram targets
+        (protein_g, carbs_g, fat_g); diabetic: (n,) bool.
+        Returns (picks, totals): food indexes (n, total_items) in slot order
+        and planned daily nutrient totals (n, 4). The targets used are
+        those returned by targets().
+        """
+        rng = np.random.default_rng(random_state)
+        daily, _ = self.targets(calories, macros, diabetic)
+        diabetic = np.asarray(diabetic, dtype=bool)
+        carb_limit = daily[:, CARBS]
+
+        picks, totals = [], np.zeros_like(daily)
+        for slot, pool in zip(self.slots, self.slot_pools):
+            combos = self._candidates(pool, slot["items"], rng)
+            best = np.empty(len(daily), dtype=np.int64)
+            for start in range(0, len(daily), BATCH_CHUNK):
+                chunk = slice(start, start + BATCH_CHUNK)
+                best[chunk] = self._select(
+                    daily[chunk] * slot["share"], carb_limit[chunk] * slot["share"], diabetic[chunk], combos
+                )
+            chosen = combos[best]
+            picks.append(chosen)
+            totals += self.nutrients[chosen].sum(axis=1)
+        return np.hstack(picks), totals
+
+    def plan(self, calories, macros, diabetic, random_state=None):
+        """
+        Single-user plan as a list of food records, each tagged with its meal,
+        plus the planned nutrient totals.
+        """
+        picks, totals = self.plan_batch(
+            [calories], {k: np.array([v]) for k, v in macros.items()}, [diabetic], random_state
+        )
+        labels = [slot["meal"] for slot in self.slots for _ in range(slot["items"])]
+        records = [{**self.records[i], "meal": label} for i, label in zip(picks[0], labels)]
+        return records, dict(zip(NUTRIENTS, totals[0].round(1).tolist()))
+
+    def slot_labels(self):
+        """Column labels for plan_batch picks, e.g. breakfast_1, breakfast_2, lunch_1, ..."""
+        return [f"{slot['meal'].lower()}_{i + 1}" for slot in self.slots for i in range(slot["items"])]
+
+    def within_tolerance(self, planned_calories, target_calories):
+        target = np.maximum(np.asarray(target_calories, dtype=np.float64), config.PLANNER_MIN_CALORIES)
+        return np.abs(np.asarray(planned_calories) - target) <= config.PLANNER_TOLERANCE * target
+
+
+_planner = None
+
+
+def check_food_columns(foods_df):
+    """Raise if the foods table lacks a required column (see config.FOOD_COLUMNS)."""
+    missing = [config.FOOD_COLUMNS[n] for n in config.REQUIRED_FOOD_COLUMNS
+               if config.FOOD_COLUMNS[n] not in foods_df.columns]
+    if missing:
+        raise ValueError(
+            f"❌ Foods table is missing required column(s) {missing}; "
+            f"expected {[config.FOOD_COLUMNS[n] for n in config.REQUIRED_FOOD_COLUMNS]}"
+        )
+
+
+def load_foods(path=config.FOODS_FILE):
+    """Read foods.csv and check its columns, so a wrong schema fails at load time."""
+    if not os.path.exists(str(path)):
+        raise FileNotFoundError(f"❌ Foods table not found at {path} (see README.md for the expected columns)")
+    foods_df = pd.read_csv(path)
+    check_food_columns(foods_df)
+    return foods_df
+
+
+def get_planner(foods_df):
+    """Planner for the given foods table, rebuilt only when the table object changes."""
+    global _planner
+    if _planner is None or _planner.foods_df is not foods_df:
+        _planner = MealPlanner(foods_df)
+    return _planner
@@ -0,0 +1,242 @@
+import bisect
+import cProfile
+import io
+import pstats
+import threading
+import time
+
+from src import config
+
+STAGE_METRIC = "meal_plan_stage_seconds"
+METRIC_HELP = {
+    STAGE_METRIC: "Time spent in each stage of a meal-plan request.",
+    "meal_plan_request_seconds": "End-to-end latency of API requests.",
+    "meal_plan_requests_total": "API requests by endpoint and outcome.",
+    "meal_plan_upload_bytes_total": "Bytes of uploaded clinical reports.",
+    "meal_plan_report_errors_total": "Uploaded clinical reports that could not be parsed.",
+}
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout."""
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Approximate quantile: upper bound of the bucket holding it."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets + [float("inf")], self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, self.labels)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    In-process latency histograms and counters for the hot path, rendered
+    in the Prometheus text format for /metrics.
+
+    Recording is a perf_counter pair plus a bisect under a lock; when
+    disabled, timers are a shared no-op object. Profiling mode additionally
+    runs CPU-bound calls under cProfile and aggregates their stats; when off
+    it costs one attribute check per call.
+    """
+
+    def __init__(self, enabled=None, profiling=None, buckets=None):
+        self.enabled = config.METRICS_ENABLED if enabled is None else enabled
+        self.profiling = config.PROFILING if profiling is None else profiling
+        self.buckets = list(buckets or config.METRICS_BUCKETS)
+        self._lock = threading.Lock()
+        self._histograms = {}   # (name, labels) -> Histogram
+        self._counters = {}     # (name, labels) -> float
+        self._profile = None
+
+    # ---------- recording ----------
+
+    def observe(self, name, value, labels=()):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def timer(self, name, **labels):
+        """Context manager recording the duration of its block into histogram `name`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, tuple(sorted(labels.items())))
+
+    def stage(self, stage):
+        """Time one request stage (upload_write, report_parse, predict, ...)."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, STAGE_METRIC, (("stage", stage),))
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._profile = None
+
+    # ---------- profiling ----------
+
+    def profiled(self, func, *args):
+        """Call func(*args), under cProfile when profiling mode is on."""
+        if not self.profiling:
+            return func(*args)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active on this thread (or interpreter); run unprofiled
+            return func(*args)
+        try:
+            return func(*args)
+        finally:
+            profiler.disable()
+            with self._lock:
+                if self._profile is None:
+                    self._profile = pstats.Stats(profiler)
+                else:
+                    self._profile.add(profiler)
+
+    def profile_report(self, top_n=None, sort="cumulative"):
+        """Aggregated profile of all profiled calls so far, as pstats text."""
+        with self._lock:
+            if self._profile is None:
+                return "No profiled calls yet.\n"
+            stream = io.StringIO()
+            self._profile.stream = stream
+            self._profile.sort_stats(sort).print_stats(top_n or config.PROFILE_TOP_N)
+            return stream.getvalue()
+
+    # ---------- reporting ----------
+
+    def stage_summary(self):
+        """{stage: {count, mean_ms, p50_ms, p99_ms}} with bucket-resolution quantiles."""
+        with self._lock:
+            stages = {
+                dict(labels)["stage"]: histogram
+                for (name, labels), histogram in self._histograms.items() if name == STAGE_METRIC
+            }
+            return {
+                stage: {
+                    "count": h.count,
+                    "mean_ms": 1000.0 * h.sum / h.count if h.count else 0.0,
+                    "p50_ms": 1000.0 * h.quantile(0.50),
+                    "p99_ms": 1000.0 * h.quantile(0.99),
+                }
+                for stage, h in sorted(stages.items())
+            }
+
+    def render(self, gauges=None):
+        """
+        Prometheus text exposition. gauges: optional {prefix: stats_dict};
+        numeric entries of each dict are exported as <prefix>_<key> gauges
+        (e.g. the micro-batcher and plan cache stats).
+        """
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            declared = set()
+
+            for (name, labels), h in histograms:
+                if name not in declared:
+                    declared.add(name)
+                    lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {name} histogram")
+                cumulative = 0
+                for bound, n in zip(h.buckets + [float("inf")], h.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {h.sum:.9g}")
+                lines.append(f"{name}_count{_labels(labels)} {h.count}")
+
+            for (name, labels), value in counters:
+                if name not in declared:
+                    declared.add(name)
+                    lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{_labels(labels)} {value:g}")
+
+        for prefix, stats in (gauges or {}).items():
+            for key, value in stats.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+_metrics = None
+
+
+def get_metrics():
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,290 @@
+import ast
+import csv
+import glob
+import os
+import sqlite3
+import threading
+import time
+
+from src import config
+
+PLAN_COLUMNS = [
+    "user_id", "name", "age", "gender", "goal", "calories", "protein_g", "carbs_g", "fat_g",
+    "predicted_value", "risk", "notes", "source", "created_at",
+]
+MEAL_COLUMNS = ["plan_id", "position", "meal", "item", "calories", "protein", "carbs", "fat"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    plan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    name TEXT,
+    age INTEGER,
+    gender TEXT,
+    goal TEXT,
+    calories INTEGER,
+    protein_g INTEGER,
+    carbs_g INTEGER,
+    fat_g INTEGER,
+    predicted_value REAL,
+    risk TEXT,
+    notes TEXT,
+    source TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_user_latest ON plans(user_id, plan_id);
+CREATE INDEX IF NOT EXISTS plans_source ON plans(source);
+CREATE TABLE IF NOT EXISTS plan_meals (
+    plan_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    meal TEXT,
+    item TEXT,
+    calories REAL,
+    protein REAL,
+    carbs REAL,
+    fat REAL,
+    PRIMARY KEY (plan_id, position)
+) WITHOUT ROWID;
+"""
+
+
+class PlanStore:
+    """
+    Append-only SQLite store of generated plans.
+
+    One row per plan in `plans` (indexed on user_id, plan_id so a user's
+    latest plan is a single index seek) and one row per meal item in
+    `plan_meals`. Writes go through append_plans(), which inserts a whole
+    batch in one transaction.
+    """
+
+    def __init__(self, path=config.PLAN_STORE_PATH):
+        self.path = str(path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------- writing ----------
+
+    def append_plans(self, plans):
+        """
+        Insert many plans in one transaction. Each plan is a dict with any of
+        PLAN_COLUMNS plus "meals": a list of {meal, item, calories, protein, carbs, fat}.
+        Returns the new plan ids.
+        """
+        if not plans:
+            return []
+        now = time.time()
+        conn = self._connect()
+        placeholders = ", ".join("?" for _ in PLAN_COLUMNS)
+        insert_plan = f"INSERT INTO plans ({', '.join(PLAN_COLUMNS)}) VALUES ({placeholders})"
+
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                plan_ids, meal_rows = [], []
+                for plan in plans:
+                    row = [plan.get(col) for col in PLAN_COLUMNS]
+                    row[PLAN_COLUMNS.index("created_at")] = plan.get("created_at") or now
+                    plan_id = conn.execute(insert_plan, row).lastrowid
+                    plan_ids.append(plan_id)
+                    for position, meal in enumerate(plan.get("meals") or []):
+                        meal_rows.append((
+                            plan_id, position, meal.get("meal"), meal.get("item"),
+                            meal.get("calories"), meal.get("protein"), meal.get("carbs"), meal.get("fat"),
+                        ))
+                conn.executemany(
+                    f"INSERT INTO plan_meals ({', '.join(MEAL_COLUMNS)}) VALUES ({', '.join('?' for _ in MEAL_COLUMNS)})",
+                    meal_rows,
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return plan_ids
+
+    # ---------- reading ----------
+
+    def _attach_meals(self, plans):
+        if not plans:
+            return plans
+        by_id = {plan["plan_id"]: plan for plan in plans}
+        for plan in plans:
+            plan["meals"] = []
+        rows = self._connect().execute(
+            "SELECT * FROM plan_meals WHERE plan_id BETWEEN ? AND ? ORDER BY plan_id, position",
+            (min(by_id), max(by_id)),
+        )
+        for row in rows:
+            plan = by_id.get(row["plan_id"])
+            if plan is not None:
+                meal = dict(row)
+                del meal["plan_id"], meal["position"]
+                plan["meals"].append(meal)
+        return plans
+
+    def latest_plan(self, user_id):
+        """The most recent plan for a user, or None."""
+        row = self._connect().execute(
+            "SELECT * FROM plans WHERE user_id = ? ORDER BY plan_id DESC LIMIT 1", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._attach_meals([dict(row)])[0]
+
+    def list_plans(self, after_id=0, limit=100):
+        """
+        Keyset pagination over all plans in insertion order.
+        Returns (plans, next_after_id); next_after_id is None on the last page.
+        """
+        rows = self._connect().execute(
+            "SELECT * FROM plans WHERE plan_id > ? ORDER BY plan_id LIMIT ?", (after_id, limit)
+        ).fetchall()
+        plans = self._attach_meals([dict(row) for row in rows])
+        next_after = plans[-1]["plan_id"] if len(plans) == limit else None
+        return plans, next_after
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+    # ---------- import ----------
+
+    def import_plan_csvs(self, plans_dir=config.PLANS_DIR, batch_size=None):
+        """
+        Bulk-import the legacy plans/user_<id>_plan.csv files. recommended_meals
+        is parsed with ast.literal_eval (never eval). Files already imported
+        (tracked by source) are skipped, so the import can be re-run.
+        """
+        batch_size = batch_size or config.PLAN_STORE_BATCH_SIZE
+        done = {
+            row[0] for row in self._connect().execute(
+                "SELECT DISTINCT source FROM plans WHERE source LIKE 'csv:%'"
+            )
+        }
+        imported, batch = 0, []
+        for path in sorted(glob.glob(os.path.join(str(plans_dir), "user_*_plan.csv"))):
+            source = f"csv:{os.path.basename(path)}"
+            if source in done:
+                continue
+            with open(path, newline="") as f:
+                for row in csv.DictReader(f):
+                    batch.append(_plan_from_csv_row(row, source, os.path.getmtime(path)))
+            if len(batch) >= batch_size:
+                imported += len(self.append_plans(batch))
+                batch = []
+        imported += len(self.append_plans(batch))
+        return imported
+
+
+def _plan_from_csv_row(row, source, created_at):
+    meals = []
+    for meal in ast.literal_eval(row.get("recommended_meals") or "[]"):
+        for item in meal.get("items", []):
+            meals.append({"meal": meal.get("meal"), "item": item})
+    return {
+        "user_id": int(row["user_id"]),
+        "name": row.get("name"),
+        "age": int(row["age"]) if row.get("age") else None,
+        "gender": row.get("gender"),
+        "goal": row.get("goal"),
+        "predicted_value": float(row["predicted_value"]) if row.get("predicted_value") else None,
+        "source": source,
+        "created_at": created_at,
+        "meals": meals,
+    }
+
+
+def plan_to_record(plan, user_input, source="api"):
+    """Flatten a generate_recommendations_for_user() result into a store record."""
+    cols = config.FOOD_COLUMNS
+    return {
+        "user_id": user_input.get("user_id"),
+        "name": user_input.get("name"),
+        "age": user_input.get("age"),
+        "gender": user_input.get("gender"),
+        "goal": user_input.get("goal"),
+        "calories": plan.get("calories"),
+        "protein_g": plan.get("macros", {}).get("protein_g"),
+        "carbs_g": plan.get("macros", {}).get("carbs_g"),
+        "fat_g": plan.get("macros", {}).get("fat_g"),
+        "predicted_value": plan.get("predicted_calories"),
+        "risk": plan.get("risk") or None,
+        "notes": plan.get("notes"),
+        "source": source,
+        "meals": [
+            {
+                "meal": food.get("meal"),
+                "item": food.get(cols["name"]),
+                "calories": food.get(cols["calories"]),
+                "protein": food.get(cols["protein"]),
+                "carbs": food.get(cols["carbs"]),
+                "fat": food.get(cols["fat"]),
+            }
+            for food in plan.get("meals", [])
+        ],
+    }
+
+
+class BufferedPlanWriter:
+    """Collects plans in memory and writes them to the store in batches."""
+
+    def __init__(self, store, batch_size=None):
+        self.store = store
+        self.batch_size = batch_size or config.PLAN_STORE_BATCH_SIZE
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        """Queue one record; returns True when the buffer is due for a flush."""
+        with self._lock:
+            self._buffer.append(record)
+            return len(self._buffer) >= self.batch_size
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            try:
+                self.store.append_plans(batch)
+            except Exception:
+                # Put the batch back so the next flush retries it
+                with self._lock:
+                    self._buffer = batch + self._buffer
+                raise
+        return len(batch)
+
+
+_plan_store = None
+
+
+def get_plan_store():
+    global _plan_store
+    if _plan_store is None:
+        _plan_store = PlanStore()
+    return _plan_store
+
+
+# Import the legacy per-user CSV files
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import plans/user_<id>_plan.csv files into the plan store.")
+    parser.add_argument("--plans-dir", default=str(config.PLANS_DIR))
+    parser.add_argument("--store", default=str(config.PLAN_STORE_PATH))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = PlanStore(args.store)
+    imported = store.import_plan_csvs(args.plans_dir)
+    print(f"✅ Imported {imported} plans in {time.perf_counter() - start:.2f}s ({store.count()} in {args.store})")
@@ -1,71 +1,279 @@
 import pandas as pd
-import joblib
+import numpy as np
+import io
 import os
 
-# Paths
-ML_MODEL_PATH = os.path.join("models", "calorie_macro_predictor_lgbm.pkl")
-FOODS_PATH = os.path.join("data", "foods.csv")
+from src import clinical_parser
+from src import config
+from src.cache import get_plan_cache, make_plan_key, normalize_user_input
+from src.features import FEATURE_NAMES, get_encoder
+from src.meal_planner import get_planner
+from src.metrics import get_metrics
+from src.registry import get_registry
+from src.report_store import get_store
+from src.risk_engine import get_engine
 
-# Load ML model
-ml_model = joblib.load(ML_MODEL_PATH)
 
-# Load food database
-foods_df = pd.read_csv(FOODS_PATH)
+# ML model and food database are loaded lazily (and hot-reloaded) by the
+# registry; these module attributes remain for existing callers
+def __getattr__(name):
+    if name == "ml_model":
+        return get_registry().get_model()
+    if name == "foods_df":
+        return get_registry().get_foods()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Example function to analyze diabetes report (replace with actual logic if available)
-def analyze_report(report_file):
-    # Placeholder: return dict with any adjustments based on report
-    if report_file and os.path.exists(report_file):
-        # Example: could parse report to check blood sugar or carbs
-        return {"note": "Adjusted for diabetes"}
-    return {}
+# Feature encoding lives in src/features.py and is bundled with the model, so
+# these always encode the way the model being served was trained
+FEATURE_ORDER = FEATURE_NAMES
+
+
+def encode_features(df):
+    """
+    Vectorized encoding of a users DataFrame into the model's feature matrix.
+    Works the same for one row or the whole users file.
+    """
+    return get_registry().get_encoder().encode(df)
+
+
+def encode_user_row(user_input):
+    """Same encoding as encode_features() for one dict, without building a DataFrame."""
+    return get_registry().get_encoder().encode_row(user_input)
+
+
+def predict_calories(feature_rows):
+    """One model call for a 2-D array (or DataFrame) of encoded feature rows."""
+    model = get_registry().get_model()
+    if not isinstance(feature_rows, pd.DataFrame):
+        columns = get_encoder(model).feature_names
+        feature_rows = pd.DataFrame(np.asarray(feature_rows, dtype=np.float64), columns=columns)
+    with get_metrics().stage("predict"):
+        return model.predict(feature_rows)
+
+
+def compute_macros(calories, goal=None):
+    """
+    Macro distribution (grams) for a scalar or array of calories.
+    goal may be one goal or an array of goals; unknown goals use the maintain split.
+    """
+    calories = np.asarray(calories, dtype=float)
+    default = config.GOAL_MACRO_SPLIT["maintain"]
+    goals = np.broadcast_to(np.asarray(goal, dtype=object), calories.shape).astype(str)
+    # Look up each distinct goal once, then broadcast back
+    unique_goals, inverse = np.unique(goals, return_inverse=True)
+    splits = [config.GOAL_MACRO_SPLIT.get(g, default) for g in unique_goals]
+    shares = {
+        nutrient: np.array([split[nutrient] for split in splits])[inverse].reshape(calories.shape)
+        for nutrient in ["protein", "carbs", "fat"]
+    }
+    return {
+        "protein_g": (shares["protein"] * calories / 4).astype(int),
+        "carbs_g": (shares["carbs"] * calories / 4).astype(int),
+        "fat_g": (shares["fat"] * calories / 9).astype(int),
+    }
+
+# Analyze a diabetes report (stored reading for known users, else the uploaded file)
+def analyze_report(report_file, user_id=None, report_data=None):
+    report = {"error": "No report"}
+    if user_id is not None:
+        report = clinical_parser.analyze_report(user_id=user_id)
+
+    # Uploaded bytes already in memory are parsed directly, no disk round-trip
+    report_source = None
+    if report_data is not None:
+        report_source = io.BytesIO(report_data)
+    elif report_file and os.path.exists(report_file):
+        report_source = report_file
+
+    if "error" in report and report_source is not None:
+        report = clinical_parser.analyze_report(report_source)
+        if "error" in report:
+            # Unreadable report: still flag that the plan was adjusted
+            return {"note": "Adjusted for diabetes"}
+    if "error" in report:
+        return {}
+    return {"note": "; ".join(report["notes"]), "risk": report["risk"]}
 
 # Function to generate meal plan for a single user (console-friendly)
 def generate_recommendations_for_user(user_input):
     """
     user_input: dict with keys:
       age, weight_kg, height_cm, activity_level, gender, goal, diabetes, report_file
+      and optionally user_id (to read the clinical report store) and
+      report_data (uploaded report bytes already in memory)
     """
-    # Prepare features for ML model
-    feature_order = ["age", "weight_kg", "height_cm", "activity_level", "gender"]
-    features = pd.DataFrame([user_input])[feature_order]
-
-    # Convert categorical columns to numbers if needed
-    # Example mapping
-    features["activity_level"] = features["activity_level"].map({
-        "sedentary": 0,
-        "light": 1,
-        "moderate": 2,
-        "active": 3,
-        "very_active": 4
-    }).fillna(0)
-    features["gender"] = features["gender"].map({"M": 0, "F": 1}).fillna(0)
-
-    # Predict calories
-    predicted_calories = ml_model.predict(features)[0]
-
-    # Basic macro distribution (can adjust)
-    macros = {
-        "protein_g": int(0.3 * predicted_calories / 4),
-        "carbs_g": int(0.5 * predicted_calories / 4),
-        "fat_g": int(0.2 * predicted_calories / 9),
-    }
+    # Prepare features for ML model and predict calories
+    with get_metrics().stage("feature_encoding"):
+        features = encode_user_row(user_input)[np.newaxis, :]
+    predicted_calories = predict_calories(features)[0]
+    return build_meal_plan(user_input, predicted_calories)
+
+
+def build_meal_plan(user_input, predicted_calories):
+    """Macros, diabetes adjustments and meals around an already predicted calorie target."""
+    # Basic macro distribution (can adjust), for the calories actually planned
+    target_calories = max(float(predicted_calories), config.PLANNER_MIN_CALORIES)
+    macros = {k: int(v) for k, v in compute_macros(target_calories, user_input.get("goal")).items()}
 
     # If diabetic, adjust based on report
     diabetes_adjustments = {}
     if user_input.get("diabetes"):
-        diabetes_adjustments = analyze_report(user_input.get("report_file"))
+        diabetes_adjustments = analyze_report(
+            user_input.get("report_file"), user_input.get("user_id"), user_input.get("report_data")
+        )
+
+    # Pick breakfast/lunch/dinner items that fit the calorie and macro targets
+    diabetic = bool(user_input.get("diabetes"))
+    with get_metrics().stage("food_selection"):
+        planner = get_planner(get_registry().get_foods())
+        meals, planned = planner.plan(predicted_calories, macros, diabetic)
+        targets, floored = planner.targets([predicted_calories], {k: [v] for k, v in macros.items()}, [diabetic])
 
-    # Generate simple meal plan using foods_df (random example)
+    # Report the targets the meals were planned for, not the raw prediction
     meal_plan = {
-        "calories": int(predicted_calories),
-        "macros": macros,
+        "calories": int(targets[0, 0]),
+        "macros": {k: int(v) for k, v in zip(["protein_g", "carbs_g", "fat_g"], targets[0, 1:])},
+        "predicted_calories": round(float(predicted_calories), 1),
+        "calorie_floor_applied": bool(floored[0]),
+        "risk": diabetes_adjustments.get("risk"),
         "notes": diabetes_adjustments.get("note", ""),
-        "meals": foods_df.sample(3).to_dict(orient="records")  # 3 random foods
+        "meals": meals,
+        "planned_totals": planned,
     }
 
     return meal_plan
 
+
+def _report_fingerprint(user_input, upload_fingerprint=None):
+    """What the diabetes notes depend on: the stored reading for known users, else the upload hash."""
+    if not user_input.get("diabetes"):
+        return None
+    if user_input.get("user_id") is not None:
+        try:
+            reading = get_store().latest(user_input["user_id"])
+        except Exception:
+            # Same fallback as analyze_report: the plan then depends on the upload only
+            reading = None
+        if reading is not None:
+            return sorted(reading.items())
+    return upload_fingerprint or "no-report"
+
+
+def lookup_cached_plan(user_input, upload_fingerprint=None):
+    """
+    Returns (normalized_input, cache_key, cached_plan_or_None).
+    cache_key is None when caching is disabled; callers should compute the
+    plan from normalized_input and store it under cache_key.
+    """
+    cache = get_plan_cache()
+    if cache is None:
+        return user_input, None, None
+
+    # Make sure the artifacts are loaded/refreshed so their versions are current
+    registry = get_registry()
+    registry.get_model()
+    registry.get_foods()
+    model_version, foods_version = registry.version("model"), registry.version("foods")
+    cache.set_generation(f"{model_version}/{foods_version}")
+
+    with get_metrics().stage("cache_lookup"):
+        normalized = normalize_user_input(user_input)
+        key = make_plan_key(normalized, model_version, foods_version, _report_fingerprint(normalized, upload_fingerprint))
+        return normalized, key, cache.get(key)
+
+
+def build_meal_plan_cached(user_input, predicted_calories, cache_key=None):
+    """build_meal_plan, then store the plan under cache_key from lookup_cached_plan (blocking: run off the loop)."""
+    plan = build_meal_plan(user_input, predicted_calories)
+    if cache_key is not None:
+        get_plan_cache().put(cache_key, plan)
+    return plan
+
+
+def generate_recommendations_cached(user_input, upload_fingerprint=None):
+    """generate_recommendations_for_user behind the plan cache."""
+    normalized, key, plan = lookup_cached_plan(user_input, upload_fingerprint)
+    if plan is None:
+        plan = generate_recommendations_for_user(normalized)
+        if key is not None:
+            get_plan_cache().put(key, plan)
+    return plan
+
+
+def _to_bool(series):
+    """Normalize yes/no, true/false and bool columns to a boolean Series."""
+    if series.dtype == bool:
+        return series
+    return series.astype(str).str.strip().str.lower().isin(["yes", "true", "1", "y"])
+
+
+def generate_recommendations_batch(users_df, reports_df=None, random_state=None):
+    """
+    Generate meal plans for many users in one vectorized pass.
+
+    users_df: DataFrame with the users.csv columns
+      (user_id, name, age, gender, height_cm, weight_kg, activity_level, goal, diabetes)
+    reports_df: optional clinical reports DataFrame keyed by user_id;
+      the latest row per user is scored and joined to diabetic users.
+    Returns one DataFrame (one row per user) with calories, macros, notes and
+    the selected foods as one column per meal item (breakfast_1, lunch_1, ...).
+    """
+    users_df = users_df.reset_index(drop=True)
+    n_users = len(users_df)
+    rng = np.random.default_rng(random_state)
+
+    # One encode + one predict call for the whole population
+    features = encode_features(users_df)
+    predicted_calories = predict_calories(features)
+    goals = users_df["goal"].to_numpy(dtype=object) if "goal" in users_df.columns else None
+    macros = compute_macros(np.maximum(predicted_calories, config.PLANNER_MIN_CALORIES), goals)
+
+    # Bulk clinical join: latest report per user, scored by the risk engine
+    diabetic = _to_bool(users_df["diabetes"]) if "diabetes" in users_df.columns else pd.Series(False, index=users_df.index)
+    notes = np.full(n_users, "", dtype=object)
+    risk = np.full(n_users, "", dtype=object)
+    if reports_df is not None and "user_id" in users_df.columns:
+        latest = reports_df.drop_duplicates("user_id", keep="last")
+        engine = get_engine()
+        levels, fired = engine.evaluate(latest)
+        scored = pd.DataFrame({
+            "user_id": latest["user_id"].to_numpy(),
+            "risk": engine.level_names(levels),
+            "notes": engine.notes(latest, fired),
+        })
+        joined = users_df[["user_id"]].merge(scored, on="user_id", how="left")
+        use_report = (diabetic & joined["risk"].notna()).to_numpy()
+        notes[use_report] = joined["notes"].to_numpy()[use_report]
+        risk[use_report] = joined["risk"].to_numpy()[use_report]
+
+    # Constraint-based meal selection for every user at once
+    foods_df = get_registry().get_foods()
+    planner = get_planner(foods_df)
+    picks, planned = planner.plan_batch(predicted_calories, macros, diabetic.to_numpy(), rng)
+    name_column = config.FOOD_COLUMNS["name"]
+    if name_column not in foods_df.columns:
+        name_column = foods_df.columns[0]
+    food_names = foods_df[name_column].to_numpy()
+
+    targets, floored = planner.targets(predicted_calories, macros, diabetic.to_numpy())
+
+    id_columns = [c for c in ["user_id", "name", "age", "gender", "goal"] if c in users_df.columns]
+    result = users_df[id_columns].copy()
+    result["diabetes"] = diabetic.values
+    # Targets the meals were planned for (floored / rescaled / carb-capped)
+    result["calories"] = targets[:, 0].astype(int)
+    for i, key in enumerate(["protein_g", "carbs_g", "fat_g"]):
+        result[key] = targets[:, i + 1].astype(int)
+    result["predicted_calories"] = np.round(predicted_calories, 1)
+    result["calorie_floor_applied"] = floored
+    result["risk"] = risk
+    result["notes"] = notes
+    result["planned_calories"] = planned[:, 0].round().astype(int)
+    result["within_tolerance"] = planner.within_tolerance(planned[:, 0], predicted_calories)
+    for i, label in enumerate(planner.slot_labels()):
+        result[label] = food_names[picks[:, i]]
+    return result
+
 # For console testing
 if __name__ == "__main__":
     # Example input from console
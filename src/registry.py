@@ -0,0 +1,267 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.features import FeatureEncoder, get_encoder
+from src.meal_planner import load_foods
+
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+MISSING_TYPES = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+ZERO_THRESHOLD = 1e-35
+TREE_ARRAYS = ["feature", "threshold", "left", "right", "default_left", "missing_type", "leaf_value", "roots"]
+
+
+# ---------- NumPy tree export ----------
+
+def export_trees(model, out_dir=config.ML_TREES_DIR, encoder=None):
+    """
+    Flatten a trained LightGBM model into plain arrays (one .npy per field)
+    so it can be predicted with NumPy alone. Children < 0 are leaves, encoded
+    as ~leaf_index. Only numerical splits of single-output models are supported.
+    The model's feature encoder is stored in meta.json alongside the trees.
+    """
+    booster = model.booster_ if hasattr(model, "booster_") else model
+    dump = booster.dump_model()
+    if dump["num_tree_per_iteration"] != 1:
+        raise ValueError("Only single-output models can be exported")
+
+    nodes = {name: [] for name in ["feature", "threshold", "left", "right", "default_left", "missing_type"]}
+    leaf_values = []
+    roots = []
+
+    def visit(node):
+        if "split_index" not in node:
+            leaf_values.append(node["leaf_value"])
+            return ~(len(leaf_values) - 1)
+        if node["decision_type"] != "<=":
+            raise ValueError("Categorical splits are not supported by the NumPy predictor")
+        index = len(nodes["feature"])
+        nodes["feature"].append(node["split_feature"])
+        nodes["threshold"].append(node["threshold"])
+        nodes["default_left"].append(node["default_left"])
+        nodes["missing_type"].append(MISSING_TYPES[node["missing_type"]])
+        nodes["left"].append(0)
+        nodes["right"].append(0)
+        nodes["left"][index] = visit(node["left_child"])
+        nodes["right"][index] = visit(node["right_child"])
+        return index
+
+    for tree in dump["tree_info"]:
+        roots.append(visit(tree["tree_structure"]))
+
+    arrays = {
+        "feature": np.asarray(nodes["feature"], dtype=np.int32),
+        "threshold": np.asarray(nodes["threshold"], dtype=np.float64),
+        "left": np.asarray(nodes["left"], dtype=np.int32),
+        "right": np.asarray(nodes["right"], dtype=np.int32),
+        "default_left": np.asarray(nodes["default_left"], dtype=bool),
+        "missing_type": np.asarray(nodes["missing_type"], dtype=np.int8),
+        "leaf_value": np.asarray(leaf_values, dtype=np.float64),
+        "roots": np.asarray(roots, dtype=np.int32),
+    }
+
+    out_dir = str(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    meta_path = os.path.join(out_dir, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for name, array in arrays.items():
+        # Replace (not overwrite) so workers still mapping the old arrays are unaffected
+        path = os.path.join(out_dir, f"{name}.npy")
+        np.save(path + ".tmp.npy", array)
+        os.replace(path + ".tmp.npy", path)
+    meta = {
+        "objective": dump["objective"],
+        "average_output": dump["average_output"],
+        "feature_names": dump["feature_names"],
+        "num_trees": len(roots),
+        "encoder": (encoder or get_encoder(model)).to_dict(),
+    }
+    # meta.json is written last; its presence marks a complete export
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return out_dir
+
+
+class TreePredictor:
+    """Predicts from arrays written by export_trees(); needs only NumPy."""
+
+    def __init__(self, arrays, meta):
+        self.arrays = arrays
+        self.meta = meta
+        self.feature_names_in_ = np.asarray(meta["feature_names"], dtype=object)
+        if "encoder" in meta:
+            self.feature_encoder = FeatureEncoder.from_dict(meta["encoder"])
+        objective = meta["objective"].split()[0]
+        if objective not in ("regression", "regression_l2", "regression_l1", "huber", "fair", "quantile", "mape"):
+            raise ValueError(f"Unsupported objective for the NumPy predictor: {objective}")
+
+    @classmethod
+    def load(cls, tree_dir=config.ML_TREES_DIR, mmap=True):
+        """Memory-map the arrays so forked workers share the same pages."""
+        tree_dir = str(tree_dir)
+        with open(os.path.join(tree_dir, "meta.json"), "r") as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(tree_dir, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            for name in TREE_ARRAYS
+        }
+        return cls(arrays, meta)
+
+    def predict(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = X[list(self.meta["feature_names"])].to_numpy(dtype=np.float64)
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        a = self.arrays
+
+        # Walk every tree for every row at once: nodes[i, t] is row i's position in tree t
+        n_rows = X.shape[0]
+        nodes = np.broadcast_to(np.asarray(a["roots"]), (n_rows, len(a["roots"]))).copy()
+        rows = np.broadcast_to(np.arange(n_rows)[:, None], nodes.shape)
+
+        active = nodes >= 0
+        while active.any():
+            idx = nodes[active]
+            values = X[rows[active], a["feature"][idx]]
+            missing_type = a["missing_type"][idx]
+            is_nan = np.isnan(values)
+            values = np.where(is_nan & (missing_type != MISSING_NAN), 0.0, values)
+            is_missing = ((missing_type == MISSING_ZERO) & (np.abs(values) <= ZERO_THRESHOLD)) | \
+                         ((missing_type == MISSING_NAN) & is_nan)
+            go_left = np.where(is_missing, a["default_left"][idx], values <= a["threshold"][idx])
+            nodes[active] = np.where(go_left, a["left"][idx], a["right"][idx])
+            active = nodes >= 0
+
+        output = np.asarray(a["leaf_value"])[~nodes].sum(axis=1)
+        if self.meta["average_output"]:
+            output /= len(a["roots"])
+        return output
+
+
+# ---------- artifact registry ----------
+
+def load_model_artifact(path):
+    """
+    Load a pickled model. Versioned artifacts (see src/training.py) are dicts
+    bundling the model with its encoder; the encoder and version are attached
+    to the model. Plain legacy pickles are returned as they are.
+    """
+    import joblib
+    artifact = joblib.load(path)
+    if not isinstance(artifact, dict):
+        return artifact
+    model = artifact["model"]
+    model.feature_encoder = FeatureEncoder.from_dict(artifact["encoder"])
+    model.artifact_version = artifact.get("version")
+    return model
+
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+class ArtifactRegistry:
+    """
+    Lazily loads the model and foods table on first use from config paths,
+    then hot-reloads them when the underlying file changes (checked at most
+    every reload_interval seconds). Loaded objects are treated as read-only,
+    so after preload() they can be shared copy-on-write by forked workers.
+    """
+
+    def __init__(self, model_path=config.ML_MODEL_PATH, foods_path=config.FOODS_FILE,
+                 trees_dir=config.ML_TREES_DIR, use_trees=None, reload_interval=None):
+        self.model_path = str(model_path)
+        self.foods_path = str(foods_path)
+        self.trees_dir = str(trees_dir)
+        self.use_trees = config.USE_NUMPY_TREES if use_trees is None else use_trees
+        self.reload_interval = config.ARTIFACT_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        self._lock = threading.Lock()
+        self._entries = {}   # name -> (object, fingerprint, last_checked)
+
+    def _model_source(self):
+        """Prefer the exported NumPy trees when enabled and at least as new as the pickle."""
+        meta_path = os.path.join(self.trees_dir, "meta.json")
+        if self.use_trees and os.path.exists(meta_path):
+            if not os.path.exists(self.model_path) or \
+                    os.stat(meta_path).st_mtime_ns >= os.stat(self.model_path).st_mtime_ns:
+                return meta_path, lambda: TreePredictor.load(self.trees_dir)
+        return self.model_path, self._load_pickle
+
+    def _load_pickle(self):
+        # joblib is imported inside, so the NumPy-trees path never pays for joblib/lightgbm
+        return load_model_artifact(self.model_path)
+
+    def _get(self, name, source):
+        entry = self._entries.get(name)
+        now = time.monotonic()
+        if entry is not None and now - entry[2] < self.reload_interval:
+            return entry[0]
+
+        with self._lock:
+            entry = self._entries.get(name)
+            path, loader = source()
+            fingerprint = _fingerprint(path)
+            if entry is not None and entry[1] == (path, fingerprint):
+                self._entries[name] = (entry[0], entry[1], now)
+                return entry[0]
+            try:
+                obj = loader()
+            except Exception as e:
+                if entry is None:
+                    raise
+                # Keep serving the previous artifact if the new one is half-written
+                print(f"❌ Failed to reload {name} from {path}: {e}")
+                self._entries[name] = (entry[0], entry[1], now)
+                return entry[0]
+            if entry is not None:
+                print(f"✅ Reloaded {name} from {path}")
+            self._entries[name] = (obj, (path, fingerprint), now)
+            return obj
+
+    def get_model(self):
+        return self._get("model", self._model_source)
+
+    def get_encoder(self):
+        """Feature encoder of the model currently being served."""
+        return get_encoder(self.get_model())
+
+    def get_foods(self):
+        return self._get("foods", lambda: (self.foods_path, lambda: load_foods(self.foods_path)))
+
+    def version(self, name):
+        """Fingerprint of the loaded artifact (changes whenever it is reloaded)."""
+        entry = self._entries.get(name)
+        return None if entry is None else entry[1][1]
+
+    def preload(self):
+        """Load everything now, e.g. in the master process before workers fork."""
+        self.get_model()
+        self.get_foods()
+
+
+_default_registry = None
+
+
+def get_registry():
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ArtifactRegistry()
+    return _default_registry
+
+
+# Export the configured model to NumPy arrays
+if __name__ == "__main__":
+    model = load_model_artifact(config.ML_MODEL_PATH)
+    out_dir = export_trees(model)
+
+    predictor = TreePredictor.load(out_dir)
+    sample = pd.read_csv(config.USERS_FILE).head(100)
+    features = get_encoder(model).encode(sample)
+    max_diff = np.abs(predictor.predict(features) - model.predict(features)).max()
+    print(f"✅ Exported {predictor.meta['num_trees']} trees to {out_dir} (max abs diff {max_diff:.2e})")
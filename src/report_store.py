@@ -0,0 +1,335 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from src import config
+
+try:
+    import fcntl
+except ImportError:   # Windows: only threads within one process are serialized
+    fcntl = None
+
+# Column layout of the binary store (one raw file per column)
+ID_COLUMN = "user_id"
+READING_COLUMNS = ["fasting_blood_sugar", "postprandial_sugar", "hba1c"]
+TYPE_COLUMN = "report_type"
+
+COLUMN_DTYPES = {
+    ID_COLUMN: np.int64,
+    TYPE_COLUMN: np.int16,
+    **{col: np.float32 for col in READING_COLUMNS},
+}
+
+META_FILE = "meta.json"
+INDEX_IDS_FILE = "index_user_ids.npy"
+INDEX_ROWS_FILE = "index_latest_rows.npy"
+CURRENT_FILE = "CURRENT"     # name of the active generation directory
+LOCK_FILE = "store.lock"
+
+
+def store_dir_for(csv_path):
+    """Each CSV gets its own store under REPORT_STORE_DIR, so stores never overwrite each other."""
+    csv_path = os.path.abspath(str(csv_path))
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    digest = hashlib.sha1(csv_path.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(str(config.REPORT_STORE_DIR), f"{stem}-{digest}")
+
+
+class ClinicalReportStore:
+    """
+    Columnar, memory-mapped copy of the clinical reports CSV.
+
+    The CSV is parsed once into raw column files plus a sorted user_id index
+    that points at each user's latest reading. When rows are appended to the
+    CSV only the new bytes are parsed and appended to the store, so a lookup
+    is a binary search over the index and never touches the CSV.
+
+    Files live in a generation directory named by store_dir/CURRENT. Appends
+    only grow the current generation's files; a rebuild writes a new
+    generation and switches CURRENT atomically, so files other workers have
+    memory-mapped are never truncated. Updates hold a file lock on
+    store_dir/store.lock and re-read the on-disk state under it, so several
+    processes or threads sharing a store never append the same rows twice.
+    """
+
+    def __init__(self, csv_path=config.REPORTS_FILE, store_dir=None):
+        self.csv_path = str(csv_path)
+        self.store_dir = str(store_dir or store_dir_for(csv_path))
+        self._generation = None
+        self._thread_lock = threading.RLock()
+        # (meta, columns, index_ids, index_rows), replaced as a whole by _open()
+        self._snapshot = None
+        self._build_ids = None
+        self._build_rows = None
+        self._csv_stat = None
+
+    # ---------- building ----------
+
+    def refresh(self):
+        """
+        Bring the store up to date with the CSV. Returns the number of new rows.
+        Rebuilds from scratch if the CSV was truncated or its header changed.
+        """
+        with self._locked():
+            stat = os.stat(self.csv_path)
+            # Another worker may have updated the store since we last looked
+            self._generation = self._read_current()
+            meta = self._read_meta() if self._generation else None
+
+            if meta is None or not self._is_append_of(meta, stat):
+                added = self._rebuild()
+            else:
+                self._build_ids, self._build_rows = self._read_index()
+                added = self._append_tail(meta) if stat.st_size > meta["csv_offset"] else 0
+
+            self._csv_stat = (stat.st_size, stat.st_mtime_ns)
+            self._open()
+            return added
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            os.makedirs(self.store_dir, exist_ok=True)
+            with open(os.path.join(self.store_dir, LOCK_FILE), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _is_append_of(self, meta, stat):
+        if meta.get("csv_path") != os.path.abspath(self.csv_path):
+            return False
+        if stat.st_size < meta["csv_offset"]:
+            return False
+        with open(self.csv_path, "rb") as f:
+            header = f.readline().decode("utf-8").strip()
+        return header == meta["header"]
+
+    def _rebuild(self):
+        # Build a fresh generation; the files of the current one stay untouched
+        previous = self._generation
+        number = int(previous.split("-")[1]) + 1 if previous else 1
+        self._generation = f"gen-{number}"
+        data_dir = self._data_dir()
+        shutil.rmtree(data_dir, ignore_errors=True)   # leftovers of an interrupted rebuild
+        os.makedirs(data_dir)
+        for col in COLUMN_DTYPES:
+            open(self._column_path(col), "wb").close()
+
+        with open(self.csv_path, "rb") as f:
+            header = f.readline().decode("utf-8").strip()
+
+        meta = {
+            "csv_path": os.path.abspath(self.csv_path),
+            "header": header,
+            "csv_offset": len(header.encode("utf-8")) + 1,
+            "rows": 0,
+            "report_types": [],
+        }
+        self._build_ids = np.empty(0, dtype=np.int64)
+        self._build_rows = np.empty(0, dtype=np.int64)
+        self._append_tail(meta)
+        if not os.path.exists(os.path.join(data_dir, META_FILE)):
+            self._write_meta(meta)
+
+        # Switch readers over, then drop older generations (mappings of
+        # unlinked files stay valid in processes that still hold them)
+        self._write_current(self._generation)
+        for name in os.listdir(self.store_dir):
+            if name.startswith("gen-") and name != self._generation:
+                shutil.rmtree(os.path.join(self.store_dir, name), ignore_errors=True)
+        return meta["rows"]
+
+    def _append_tail(self, meta):
+        with open(self.csv_path, "rb") as f:
+            f.seek(meta["csv_offset"])
+            tail = f.read()
+
+        # Only consume complete lines; a partially written row is picked up next time
+        end = tail.rfind(b"\n") + 1
+        if end == 0:
+            return 0
+        tail = tail[:end]
+
+        names = meta["header"].split(",")
+        new_rows = pd.read_csv(io.BytesIO(tail), header=None, names=names)
+        if new_rows.empty:
+            meta["csv_offset"] += end
+            self._write_meta(meta)
+            return 0
+
+        # Encode report_type strings as small integer codes
+        report_types = meta["report_types"]
+        for value in pd.unique(new_rows[TYPE_COLUMN].astype(str)):
+            if value not in report_types:
+                report_types.append(value)
+        codes = {value: i for i, value in enumerate(report_types)}
+        new_rows[TYPE_COLUMN] = new_rows[TYPE_COLUMN].astype(str).map(codes)
+
+        for col, dtype in COLUMN_DTYPES.items():
+            values = new_rows[col].to_numpy(dtype=dtype)
+            with open(self._column_path(col), "ab") as f:
+                f.write(np.ascontiguousarray(values).tobytes())
+
+        self._update_index(new_rows[ID_COLUMN].to_numpy(dtype=np.int64), meta["rows"])
+
+        meta["rows"] += len(new_rows)
+        meta["csv_offset"] += end
+        self._write_meta(meta)
+        return len(new_rows)
+
+    def _update_index(self, new_ids, first_row):
+        # Works on the build copy; readers switch to it in _open()
+        # Latest row for each user within the new batch
+        reversed_ids = new_ids[::-1]
+        batch_ids, last_pos = np.unique(reversed_ids, return_index=True)
+        batch_rows = first_row + (len(new_ids) - 1 - last_pos)
+
+        # Merge with the existing index; new rows win over old ones
+        keep = ~np.isin(self._build_ids, batch_ids, assume_unique=True)
+        ids = np.concatenate([self._build_ids[keep], batch_ids])
+        rows = np.concatenate([self._build_rows[keep], batch_rows])
+        order = np.argsort(ids, kind="stable")
+        self._build_ids = ids[order]
+        self._build_rows = rows[order]
+
+        self._atomic_save(INDEX_IDS_FILE, self._build_ids)
+        self._atomic_save(INDEX_ROWS_FILE, self._build_rows)
+
+    # ---------- reading ----------
+
+    def _open(self):
+        meta = self._read_meta()
+        columns = {
+            col: np.memmap(self._column_path(col), dtype=dtype, mode="r", shape=(meta["rows"],))
+            if meta["rows"] else np.empty(0, dtype=dtype)
+            for col, dtype in COLUMN_DTYPES.items()
+        }
+        index_ids, index_rows = self._read_index()
+        # One assignment, so a concurrent lookup that read the old snapshot
+        # keeps using a consistent set of meta, columns and index
+        self._snapshot = (meta, columns, index_ids, index_rows)
+
+    def _read_index(self):
+        ids_path = os.path.join(self._data_dir(), INDEX_IDS_FILE)
+        if os.path.exists(ids_path):
+            return (
+                np.load(ids_path, mmap_mode="r"),
+                np.load(os.path.join(self._data_dir(), INDEX_ROWS_FILE), mmap_mode="r"),
+            )
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    def _ensure_fresh(self):
+        """
+        Cheap stat() check; only parses when the CSV actually changed.
+        Returns the snapshot to read from, so callers never mix two refreshes.
+        """
+        stat = os.stat(self.csv_path)
+        if self._csv_stat != (stat.st_size, stat.st_mtime_ns):
+            self.refresh()
+        return self._snapshot
+
+    def latest(self, user_id):
+        """Latest reading for one user as a dict, or None if the user has no report."""
+        meta, columns, index_ids, index_rows = self._ensure_fresh()
+        pos = np.searchsorted(index_ids, user_id)
+        if pos >= len(index_ids) or index_ids[pos] != user_id:
+            return None
+        row = int(index_rows[pos])
+        reading = {ID_COLUMN: int(user_id)}
+        reading[TYPE_COLUMN] = meta["report_types"][columns[TYPE_COLUMN][row]]
+        for col in READING_COLUMNS:
+            # Stored as float32; round away the representation noise
+            reading[col] = round(float(columns[col][row]), 2)
+        return reading
+
+    def latest_many(self, user_ids):
+        """Latest readings for many users as a DataFrame (users without a report are dropped)."""
+        meta, columns, index_ids, index_rows = self._ensure_fresh()
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        pos = np.searchsorted(index_ids, user_ids)
+        pos = np.clip(pos, 0, max(len(index_ids) - 1, 0))
+        found = (index_ids[pos] == user_ids) if len(index_ids) else np.zeros(len(user_ids), bool)
+        rows = np.asarray(index_rows)[pos[found]]
+
+        report_types = np.asarray(meta["report_types"], dtype=object)
+        frame = {ID_COLUMN: user_ids[found]}
+        frame[TYPE_COLUMN] = report_types[columns[TYPE_COLUMN][rows]] if len(rows) else []
+        for col in READING_COLUMNS:
+            frame[col] = columns[col][rows]
+        return pd.DataFrame(frame)
+
+    def columns(self):
+        """All stored rows as read-only memory-mapped column arrays."""
+        return dict(self._ensure_fresh()[1])
+
+    def __len__(self):
+        return self._ensure_fresh()[0]["rows"]
+
+    # ---------- files ----------
+
+    def _data_dir(self):
+        return os.path.join(self.store_dir, self._generation)
+
+    def _column_path(self, col):
+        return os.path.join(self._data_dir(), f"{col}.bin")
+
+    def _read_current(self):
+        path = os.path.join(self.store_dir, CURRENT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            generation = f.read().strip()
+        return generation if os.path.isdir(os.path.join(self.store_dir, generation)) else None
+
+    def _write_current(self, generation):
+        path = os.path.join(self.store_dir, CURRENT_FILE)
+        with open(path + ".tmp", "w") as f:
+            f.write(generation)
+        os.replace(path + ".tmp", path)
+
+    def _read_meta(self):
+        path = os.path.join(self._data_dir(), META_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _write_meta(self, meta):
+        path = os.path.join(self._data_dir(), META_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+
+    def _atomic_save(self, name, array):
+        path = os.path.join(self._data_dir(), name)
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, array)
+        os.replace(tmp_path, path)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_store():
+    """Shared store for config.REPORTS_FILE, built on first use."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                store = ClinicalReportStore()
+                store.refresh()
+                _default_store = store
+    return _default_store
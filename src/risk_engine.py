@@ -0,0 +1,226 @@
+import operator
+
+import numpy as np
+import pandas as pd
+
+from src import config
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+NORMAL_NOTE = "All readings normal"
+
+
+class RiskEngine:
+    """
+    Evaluates diabetes risk rules as NumPy column operations.
+
+    Every rule becomes one vectorized comparison over a whole column; the
+    result is a risk level code per row plus a bitmask of the rules that
+    fired, so notes are only turned into strings for the rows that need them.
+    """
+
+    def __init__(self, rules=None, levels=None):
+        self.levels = list(levels or config.RISK_LEVELS)
+        rules = list(rules if rules is not None else config.RISK_RULES)
+        if len(rules) > 63:
+            raise ValueError("At most 63 risk rules are supported")
+        for rule in rules:
+            if rule["op"] not in OPERATORS:
+                raise ValueError(f"Unknown operator in risk rule: {rule['op']}")
+            if rule["level"] not in self.levels:
+                raise ValueError(f"Unknown risk level in risk rule: {rule['level']}")
+        # Highest level first so a column's strongest rule claims its note
+        self.rules = sorted(rules, key=lambda r: self.levels.index(r["level"]), reverse=True)
+        self.columns = sorted({rule["column"] for rule in self.rules})
+
+    def evaluate(self, table):
+        """
+        table: DataFrame or dict of equal-length column arrays.
+        Returns (levels, fired): int8 level codes and uint64 rule bitmasks.
+        Missing columns and NaN readings never trigger a rule.
+        """
+        n_rows = len(next(iter(table.values()))) if isinstance(table, dict) else len(table)
+        levels = np.zeros(n_rows, dtype=np.int8)
+        fired = np.zeros(n_rows, dtype=np.uint64)
+        noted = {}
+
+        for bit, rule in enumerate(self.rules):
+            if rule["column"] not in table:
+                continue
+            values = np.asarray(table[rule["column"]], dtype=np.float64)
+            with np.errstate(invalid="ignore"):
+                mask = OPERATORS[rule["op"]](values, rule["threshold"])
+            levels = np.maximum(levels, np.where(mask, self.levels.index(rule["level"]), 0).astype(np.int8))
+
+            covered = noted.get(rule["column"])
+            new_mask = mask if covered is None else mask & ~covered
+            noted[rule["column"]] = mask if covered is None else covered | mask
+            fired |= new_mask.astype(np.uint64) << np.uint64(bit)
+
+        return levels, fired
+
+    def level_names(self, levels):
+        return np.asarray(self.levels, dtype=object)[levels]
+
+    def notes(self, table, fired):
+        """Vectorized note strings ("; "-joined) for each row."""
+        notes = np.full(len(fired), "", dtype=object)
+        for bit, rule in enumerate(self.rules):
+            hit = (fired >> np.uint64(bit)) & np.uint64(1) == 1
+            if not hit.any():
+                continue
+            # Readings repeat a lot, so only format each distinct value once
+            values = np.round(np.asarray(table[rule["column"]], dtype=np.float64)[hit], 2)
+            unique_values, inverse = np.unique(values, return_inverse=True)
+            labels = np.array([f"{rule['note']}: {v:g}" for v in unique_values], dtype=object)
+            text = labels[inverse]
+            current = notes[hit]
+            notes[hit] = np.where(current == "", text, current + "; " + text)
+        notes[notes == ""] = NORMAL_NOTE
+        return notes
+
+    def score_reports(self, reports_df):
+        """Risk level and notes for every row of a report table."""
+        levels, fired = self.evaluate(reports_df)
+        scored = reports_df.reset_index(drop=True).copy()
+        scored["risk"] = self.level_names(levels)
+        scored["notes"] = self.notes(scored, fired)
+        return scored
+
+    # ---------- per-user screening ----------
+
+    def _partial(self, reports_df, row_offset=0):
+        """Per-user aggregates for one chunk: first/last readings, count, worst level."""
+        levels, fired = self.evaluate(reports_df)
+        chunk = pd.DataFrame({"user_id": np.asarray(reports_df["user_id"])})
+        chunk["row"] = np.arange(len(chunk)) + row_offset
+        chunk["level"] = levels
+        chunk["fired"] = fired
+        for col in self.columns:
+            if col in reports_df:
+                chunk[col] = np.asarray(reports_df[col], dtype=np.float64)
+
+        # Whole first/last rows by position; groupby().first()/.last() would
+        # skip NaN and stitch readings together from different rows
+        grouped = chunk.groupby("user_id", sort=False)
+        partial = chunk.drop_duplicates("user_id", keep="last").set_index("user_id")
+        first = chunk.drop_duplicates("user_id", keep="first").set_index("user_id")
+        partial["n_readings"] = grouped.size()
+        partial["max_level"] = grouped["level"].max()
+        partial["first_row"] = first["row"]
+        for col in self.columns:
+            if col in chunk:
+                partial[f"first_{col}"] = first[col]
+        return partial
+
+    @staticmethod
+    def _combine(partials):
+        """Merge per-chunk aggregates; state stays O(users), not O(rows)."""
+        merged = pd.concat(partials)
+        grouped = merged.groupby(level=0, sort=False)
+        # Latest chunk's row wins whole; the earliest chunk supplies the first_* columns
+        combined = merged.sort_values("row")
+        combined = combined[~combined.index.duplicated(keep="last")].copy()
+        combined["n_readings"] = grouped["n_readings"].sum()
+        combined["max_level"] = grouped["max_level"].max()
+        firsts = merged.sort_values("first_row")
+        firsts = firsts[~firsts.index.duplicated(keep="first")]
+        for col in ["first_row"] + [c for c in merged.columns if c.startswith("first_") and c != "first_row"]:
+            combined[col] = firsts[col]
+        return combined
+
+    def _finalize(self, state, with_notes=True):
+        state = state.reset_index()
+        result = pd.DataFrame({
+            "user_id": state["user_id"].to_numpy(),
+            "risk": self.level_names(state["level"].to_numpy()),
+            "max_risk": self.level_names(state["max_level"].to_numpy()),
+            "n_readings": state["n_readings"].to_numpy(),
+        })
+        for col in self.columns:
+            if col in state:
+                result[col] = state[col].to_numpy()
+                result[f"{col}_change"] = (state[col] - state[f"first_{col}"]).to_numpy()
+
+        trend_col = f"{config.RISK_TREND_COLUMN}_change"
+        result["trend"] = ""
+        if trend_col in result:
+            change = result[trend_col].to_numpy()
+            multi = result["n_readings"].to_numpy() > 1
+            tolerance = config.RISK_TREND_TOLERANCE
+            # A missing first or latest value leaves the trend unknown ("")
+            result.loc[multi & np.isfinite(change), "trend"] = "stable"
+            result.loc[multi & (change > tolerance), "trend"] = "worsening"
+            result.loc[multi & (change < -tolerance), "trend"] = "improving"
+
+        if with_notes:
+            result["notes"] = self.notes(result, state["fired"].to_numpy(dtype=np.uint64))
+        return result
+
+    def screen(self, reports_df, with_notes=True):
+        """
+        Per-user screening of a full report history (rows in chronological order).
+        Returns one row per user with the latest and worst risk level, the latest
+        readings, their change since the first reading, a trend label and notes
+        (skip with_notes when only the levels are needed).
+        """
+        return self._finalize(self._partial(reports_df), with_notes)
+
+    def screen_chunks(self, chunks, with_notes=True):
+        """Same as screen() over an iterable of DataFrame chunks."""
+        partials, offset = [], 0
+        for chunk in chunks:
+            partials.append(self._partial(chunk, row_offset=offset))
+            offset += len(chunk["user_id"])
+            # Fold as we go so memory is bounded by the number of users
+            if len(partials) > 1:
+                partials = [self._combine(partials)]
+        if not partials:
+            return pd.DataFrame(columns=["user_id", "risk", "max_risk", "n_readings", "trend", "notes"])
+        return self._finalize(partials[0], with_notes)
+
+    def screen_csv(self, csv_path, chunksize=250_000, with_notes=True):
+        """Stream a (possibly very large) report export through screen_chunks()."""
+        usecols = lambda c: c == "user_id" or c in self.columns
+        return self.screen_chunks(pd.read_csv(csv_path, usecols=usecols, chunksize=chunksize), with_notes)
+
+    def screen_store(self, store, chunksize=1_000_000, with_notes=True):
+        """Screen the memory-mapped ClinicalReportStore without loading it whole."""
+        columns = store.columns()
+        n_rows = len(columns["user_id"])
+
+        def chunks():
+            for start in range(0, n_rows, chunksize):
+                yield {
+                    col: np.asarray(columns[col][start:start + chunksize])
+                    for col in ["user_id"] + self.columns if col in columns
+                }
+
+        return self.screen_chunks(chunks(), with_notes)
+
+
+_default_engine = None
+
+
+def get_engine():
+    """Shared engine built from config.RISK_RULES."""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = RiskEngine()
+    return _default_engine
+
+
+# For console testing: screen the whole clinical reports file
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    screened = get_engine().screen_csv(config.REPORTS_FILE)
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ Screened {len(screened)} users in {elapsed * 1000:.1f} ms")
+    print(screened["risk"].value_counts().to_string())
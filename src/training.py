@@ -0,0 +1,197 @@
+import glob
+import itertools
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.features import DEFAULT_ENCODER, FeatureEncoder
+from src.utils import peak_memory_mb
+
+MODEL_NAME = "calorie_macro_predictor_lgbm"
+
+
+# ---------- data loading ----------
+
+def load_training_data(path=config.USERS_FILE, encoder=DEFAULT_ENCODER, chunksize=None):
+    """
+    Stream a users export in chunks and encode each chunk as it arrives, so
+    only the float32 feature matrix is kept in memory rather than the raw
+    strings. Rows with an unknown goal are dropped. Returns (X, y).
+    """
+    chunksize = chunksize or config.TRAIN_CHUNK_SIZE
+    usecols = encoder.feature_names + ["goal"]
+    features, targets = [], []
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize):
+        y = encoder.encode_target(chunk["goal"])
+        keep = ~np.isnan(y)
+        features.append(encoder.encode(chunk, dtype=np.float32).to_numpy()[keep])
+        targets.append(y[keep].astype(np.float32))
+    if not features:
+        raise ValueError(f"❌ No training rows found in {path}")
+    return np.concatenate(features), np.concatenate(targets)
+
+
+# ---------- hyperparameter search ----------
+
+_trial_data = None
+
+
+def _init_trial_worker(data):
+    # Each worker receives the training arrays once instead of once per trial
+    global _trial_data
+    _trial_data = data
+
+
+def _run_trial(params):
+    X_train, y_train, X_val, y_val, feature_names = _trial_data
+    model = lgb.LGBMRegressor(n_estimators=config.TRAIN_MAX_ESTIMATORS, n_jobs=1, verbose=-1, **params)
+    model.fit(
+        pd.DataFrame(X_train, columns=feature_names), y_train,
+        eval_set=[(pd.DataFrame(X_val, columns=feature_names), y_val)],
+        callbacks=[lgb.early_stopping(config.TRAIN_EARLY_STOPPING_ROUNDS, verbose=False)],
+    )
+    best_iteration = model.best_iteration_ or config.TRAIN_MAX_ESTIMATORS
+    score = model.best_score_["valid_0"]["l2"]
+    return {"params": params, "score": float(score), "best_iteration": int(best_iteration)}
+
+
+def search_hyperparameters(X, y, feature_names, param_grid=None, workers=None, seed=42):
+    """
+    Grid search with one single-threaded LightGBM fit per trial, run across
+    processes. Each trial stops early on a held-out validation split.
+    Returns the trials sorted from best to worst (lowest validation L2).
+    """
+    param_grid = param_grid or config.TRAIN_PARAM_GRID
+    names = sorted(param_grid)
+    trials = [dict(zip(names, values)) for values in itertools.product(*(param_grid[n] for n in names))]
+
+    order = np.random.default_rng(seed).permutation(len(X))
+    n_val = max(1, int(len(X) * config.TRAIN_VALIDATION_FRACTION))
+    val, train = order[:n_val], order[n_val:]
+    data = (X[train], y[train], X[val], y[val], list(feature_names))
+
+    workers = min(workers or os.cpu_count() or 1, len(trials))
+    if workers <= 1:
+        _init_trial_worker(data)
+        results = [_run_trial(params) for params in trials]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_trial_worker, initargs=(data,)) as pool:
+            results = list(pool.map(_run_trial, trials))
+    return sorted(results, key=lambda r: r["score"])
+
+
+# ---------- training and refits ----------
+
+def train(path=config.USERS_FILE, encoder=DEFAULT_ENCODER, chunksize=None, search=True, workers=None, seed=42):
+    """
+    Full training run: streamed load, optional parallel search, then one
+    multi-threaded fit on all rows with the best parameters and the number of
+    rounds early stopping chose. Returns (artifact, report).
+    """
+    start = time.perf_counter()
+    X, y = load_training_data(path, encoder, chunksize)
+    loaded = time.perf_counter()
+
+    trials = []
+    params, n_estimators = {}, 100   # LightGBM defaults when not searching
+    if search:
+        trials = search_hyperparameters(X, y, encoder.feature_names, workers=workers, seed=seed)
+        params, n_estimators = trials[0]["params"], trials[0]["best_iteration"]
+    searched = time.perf_counter()
+
+    model = lgb.LGBMRegressor(n_estimators=n_estimators, n_jobs=workers or -1, random_state=seed, verbose=-1, **params)
+    model.fit(pd.DataFrame(X, columns=encoder.feature_names), y)
+    fitted = time.perf_counter()
+
+    artifact = {
+        "model": model,
+        "encoder": encoder.to_dict(),
+        "params": {**params, "n_estimators": n_estimators},
+        "samples": int(len(X)),
+        "trained_at": time.time(),
+    }
+    report = {
+        "samples": int(len(X)),
+        "load_s": loaded - start,
+        "search_s": searched - loaded,
+        "fit_s": fitted - searched,
+        "total_s": fitted - start,
+        "trials": len(trials),
+        "best_score": trials[0]["score"] if trials else None,
+        "peak_rss_mb": peak_memory_mb(),
+        "peak_worker_rss_mb": peak_memory_mb(children=True),
+    }
+    return artifact, report
+
+
+def incremental_refit(artifact, path, rounds=None, chunksize=None):
+    """
+    Continue boosting an existing artifact on new users only: the old trees
+    are kept and `rounds` new ones are fitted to the remaining error, using
+    the artifact's own encoder. Returns (new_artifact, report).
+    """
+    start = time.perf_counter()
+    encoder = FeatureEncoder.from_dict(artifact["encoder"])
+    X, y = load_training_data(path, encoder, chunksize)
+
+    old_model = artifact["model"]
+    params = {**old_model.get_params(), "n_estimators": rounds or config.TRAIN_REFIT_ROUNDS}
+    model = lgb.LGBMRegressor(**params)
+    model.fit(pd.DataFrame(X, columns=encoder.feature_names), y, init_model=old_model.booster_)
+
+    new_artifact = {
+        **artifact,
+        "model": model,
+        "samples": artifact.get("samples", 0) + int(len(X)),
+        "refit_from": artifact.get("version"),
+        "trained_at": time.time(),
+    }
+    report = {
+        "samples": int(len(X)),
+        "trees": model.booster_.num_trees(),
+        "total_s": time.perf_counter() - start,
+        "peak_rss_mb": peak_memory_mb(),
+    }
+    return new_artifact, report
+
+
+# ---------- artifacts ----------
+
+def _versions(model_dir):
+    pattern = re.compile(rf"{MODEL_NAME}_v(\d+)\.pkl$")
+    found = (pattern.search(path) for path in glob.glob(os.path.join(str(model_dir), f"{MODEL_NAME}_v*.pkl")))
+    return sorted(int(m.group(1)) for m in found if m)
+
+
+def save_artifact(artifact, model_dir=config.MODEL_DIR, serving_path=config.ML_MODEL_PATH):
+    """
+    Write the artifact as the next models/<name>_v<N>.pkl, then atomically
+    replace the serving path with it so the registry hot-reloads the new
+    model without ever seeing a half-written file. Returns the versioned path.
+    """
+    os.makedirs(str(model_dir), exist_ok=True)
+    versions = _versions(model_dir)
+    artifact = {**artifact, "version": (versions[-1] + 1) if versions else 1}
+
+    versioned_path = os.path.join(str(model_dir), f"{MODEL_NAME}_v{artifact['version']}.pkl")
+    joblib.dump(artifact, versioned_path)
+    if serving_path:
+        tmp_path = f"{serving_path}.tmp"
+        joblib.dump(artifact, tmp_path)
+        os.replace(tmp_path, serving_path)
+    return versioned_path
+
+
+def load_artifact(path=config.ML_MODEL_PATH):
+    """Load a versioned artifact; a legacy plain model is wrapped with the default encoder."""
+    artifact = joblib.load(path)
+    if isinstance(artifact, dict):
+        return artifact
+    return {"model": artifact, "encoder": DEFAULT_ENCODER.to_dict(), "version": None}
@@ -1,5 +1,10 @@
 import json
 
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
 def load_json(path):
     with open(path, "r") as f:
         return json.load(f)
@@ -7,3 +12,10 @@ def load_json(path):
 def save_json(path, data):
     with open(path, "w") as f:
         json.dump(data, f, indent=4)
+
+def peak_memory_mb(children=False):
+    """Peak resident memory of this process (or of its finished child processes), in MB; NaN on Windows."""
+    if resource is None:
+        return float("nan")
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    return usage.ru_maxrss / 1024.0   # kilobytes on Linux
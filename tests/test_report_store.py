@@ -0,0 +1,60 @@
+import threading
+
+import numpy as np
+
+from src.report_store import ClinicalReportStore
+
+HEADER = "user_id,report_type,fasting_blood_sugar,postprandial_sugar,hba1c\n"
+
+
+def _row(user_id):
+    # Readings derived from the user id, so a lookup can tell whose row it got
+    return f"{user_id},sugar,{user_id % 1000},{user_id % 1000 + 100},{(user_id % 50) / 10:.1f}\n"
+
+
+def _check(reading, user_id):
+    assert reading is not None
+    assert reading["user_id"] == user_id
+    assert reading["fasting_blood_sugar"] == user_id % 1000
+
+
+def test_appends_during_concurrent_lookups(tmp_path):
+    csv_path = tmp_path / "reports.csv"
+    csv_path.write_text(HEADER + "".join(_row(u) for u in range(0, 2000, 2)))
+    store = ClinicalReportStore(csv_path, store_dir=tmp_path / "store")
+    store.refresh()
+
+    known = list(range(0, 2000, 2))
+    stop = threading.Event()
+    failures = []
+
+    def reader(seed):
+        rng = np.random.default_rng(seed)
+        while not stop.is_set():
+            try:
+                user_id = int(rng.choice(known))
+                _check(store.latest(user_id), user_id)
+                batch = rng.choice(known, size=16)
+                frame = store.latest_many(batch)
+                assert len(frame) == len(batch)
+                assert (frame["fasting_blood_sugar"].to_numpy() == batch % 1000).all()
+            except AssertionError as e:
+                failures.append(e)
+
+    threads = [threading.Thread(target=reader, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        # Interleaved new users shift every existing user's index position
+        for start in range(1, 400, 20):
+            with open(csv_path, "a") as f:
+                f.write("".join(_row(u) for u in range(start, start + 20, 2)))
+            store.refresh()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert not failures, f"{len(failures)} lookups returned another user's reading"
+    for user_id in range(1, 400, 2):
+        _check(store.latest(user_id), user_id)
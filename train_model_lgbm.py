@@ -1,56 +1,53 @@
-import pandas as pd
-import lightgbm as lgb
-import joblib
-from pathlib import Path
+import argparse
 
-BASE_DIR = Path(__file__).resolve().parent
-DATA_DIR = BASE_DIR / "data"
-MODEL_DIR = BASE_DIR / "models"
+from src import config
+from src.registry import export_trees, load_model_artifact
+from src.training import incremental_refit, load_artifact, save_artifact, train
 
-MODEL_DIR.mkdir(exist_ok=True)
 
-def train_model():
-    users_df = pd.read_csv(DATA_DIR / "users.csv")
+def train_model(users_file=config.USERS_FILE, chunksize=None, search=True, workers=None, seed=42):
+    artifact, report = train(users_file, chunksize=chunksize, search=search, workers=workers, seed=seed)
+    model_path = save_artifact(artifact)
 
-    # Encode gender (M=1, F=0)
-    users_df["gender"] = users_df["gender"].str.lower().map({"male": 1, "m": 1, "female": 0, "f": 0})
+    print(
+        f"✅ Model trained successfully with {report['samples']} samples in {report['total_s']:.2f}s "
+        f"(load {report['load_s']:.2f}s, search {report['search_s']:.2f}s over {report['trials']} trials, "
+        f"fit {report['fit_s']:.2f}s), saved at {model_path}"
+    )
+    print(f"   Params: {artifact['params']}")
+    print(f"   Peak memory: {report['peak_rss_mb']:.0f} MB (search workers {report['peak_worker_rss_mb']:.0f} MB)")
+    return model_path
 
-    # Encode activity_level
-    activity_map = {
-        "low": 1,
-        "moderate": 2,
-        "high": 3
-    }
-    users_df["activity_level"] = users_df["activity_level"].str.lower().map(activity_map)
 
-    # Encode goal
-    goal_map = {
-        "weight_loss": 0,
-        "maintain": 1,
-        "muscle_gain": 2
-    }
-    users_df["goal"] = users_df["goal"].str.lower().map(goal_map)
-
-    feature_columns = ["age", "weight_kg", "height_cm", "activity_level", "gender"]
-
-    # Validate required columns
-    for col in feature_columns:
-        if col not in users_df.columns:
-            raise KeyError(f"❌ Column '{col}' not found in users.csv")
-
-    X = users_df[feature_columns]
-    y = users_df["goal"]
-
-    # Train model
-    model = lgb.LGBMRegressor()
-    model.fit(X, y)
-
-    # Save model
-    model_path = MODEL_DIR / "calorie_macro_predictor_lgbm.pkl"
-    joblib.dump(model, model_path)
-
-    print(f"✅ Model trained successfully with {len(X)} samples, saved at {model_path}")
+def refit_model(new_users_file, rounds=None, chunksize=None):
+    artifact, report = incremental_refit(load_artifact(), new_users_file, rounds, chunksize)
+    model_path = save_artifact(artifact)
+    print(
+        f"✅ Refit on {report['samples']} new samples in {report['total_s']:.2f}s "
+        f"({report['trees']} trees), saved at {model_path}"
+    )
+    print(f"   Peak memory: {report['peak_rss_mb']:.0f} MB")
+    return model_path
 
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train (or incrementally refit) the calorie predictor.")
+    parser.add_argument("--users", default=str(config.USERS_FILE), help="users CSV to train on")
+    parser.add_argument("--chunksize", type=int, default=None, help="rows read per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="processes for the parameter search")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-search", action="store_true", help="skip the parameter search")
+    parser.add_argument("--refit", metavar="NEW_USERS", default=None,
+                        help="continue boosting the current model on this CSV of new users")
+    parser.add_argument("--rounds", type=int, default=None, help="boosting rounds added by --refit")
+    parser.add_argument("--export-trees", action="store_true", help="also export NumPy trees for serving")
+    args = parser.parse_args()
+
+    if args.refit:
+        path = refit_model(args.refit, args.rounds, args.chunksize)
+    else:
+        path = train_model(args.users, args.chunksize, not args.no_search, args.workers, args.seed)
+
+    if args.export_trees:
+        out_dir = export_trees(load_model_artifact(path))
+        print(f"✅ Exported NumPy trees to {out_dir}")